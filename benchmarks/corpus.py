@@ -0,0 +1,178 @@
+"""benchmarks/corpus.py
+
+Generates seeded, and so repeatable, synthetic code for benchmarking jiphy: realistic Python and JavaScript alongside
+adversarial inputs such as deeply nested blocks, long strings, comment heavy code and huge dictionary literals.
+
+Run using: python benchmarks/corpus.py DIRECTORY [--seed 0] [--scale 1.0]
+Writes every case out as a .jiphy, .py or .js file within DIRECTORY.
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import io
+import os
+import random
+
+NAMES = ('value', 'item', 'result', 'options', 'element', 'count', 'total', 'request', 'response', 'data', 'node')
+WORDS = ('the', 'quick', 'brown', 'fox', 'jumps', 'over', 'lazy', 'dog', 'with', 'some', 'more', 'text')
+
+
+def name(generator):
+    return "{0}_{1}".format(generator.choice(NAMES), generator.randint(0, 99))
+
+
+def sentence(generator, words):
+    return " ".join(generator.choice(WORDS) for _ in range(words))
+
+
+def python_condition(generator):
+    return generator.choice(("{0} is {1}", "{0} is not {1}", "{0} and not {1}", "{0} or {1}", "{0}")).format(
+           name(generator), generator.choice(("None", "True", "False", name(generator))))
+
+
+def javascript_condition(generator):
+    return generator.choice(("{0} === {1}", "{0} !== {1}", "{0} && !{1}", "{0} || {1}", "{0}")).format(
+           name(generator), generator.choice(("null", "true", "false", "undefined", name(generator))))
+
+
+def python_function(generator):
+    """Returns a Python function using the constructs jiphy supports, followed by the blank lines it needs"""
+    lines = []
+    if generator.random() < 0.2:
+        lines.append("@{0}\n".format(name(generator)))
+    lines.append("def {0}({1}, {2}):\n".format(name(generator), name(generator), name(generator)))
+    if generator.random() < 0.3:
+        lines.append("    # {0}\n".format(sentence(generator, 6)))
+    lines.append("    var {0} = {1}\n".format(name(generator), generator.choice(("None", "True", "[]", "{}", "0"))))
+    lines.append("    if {0}:\n        print({1})\n".format(python_condition(generator), name(generator)))
+    lines.append("    elif {0}:\n        {1}.append(str({2}))\n".format(python_condition(generator), name(generator),
+                                                                         name(generator)))
+    lines.append("    else:\n        del {0}\n\n".format(name(generator)))
+    if generator.random() < 0.5:
+        lines.append("    try:\n        {0}({1})\n    except Exception as error:\n        raise 'failed'\n\n".format(
+                     name(generator), name(generator)))
+    lines.append("    while {0}:\n        {1} = int({2})\n\n".format(python_condition(generator), name(generator),
+                                                                      name(generator)))
+    lines.append("    return {0}\n\n\n".format(name(generator)))
+    return "".join(lines)
+
+
+def javascript_function(generator):
+    """Returns a JavaScript function using the constructs jiphy supports"""
+    lines = ["function {0}({1}, {2}) {{\n".format(name(generator), name(generator), name(generator))]
+    if generator.random() < 0.3:
+        lines.append("    // {0}\n".format(sentence(generator, 6)))
+    lines.append("    var {0} = {1};\n".format(name(generator), generator.choice(("null", "true", "[]", "{}", "0"))))
+    lines.append("    if ({0}) {{\n        console.log({1});\n".format(javascript_condition(generator),
+                                                                       name(generator)))
+    lines.append("    }} else if ({0}) {{\n        {1}.push(String({2}));\n".format(
+                 javascript_condition(generator), name(generator), name(generator)))
+    lines.append("    }} else {{\n        delete {0};\n    }}\n".format(name(generator)))
+    if generator.random() < 0.5:
+        lines.append("    try {{\n        {0}({1});\n    }} catch (error) {{\n        throw 'failed';\n    }}\n"
+                     .format(name(generator), name(generator)))
+    lines.append("    while ({0}) {{\n        {1} = Number({2});\n    }}\n".format(javascript_condition(generator),
+                                                                               name(generator), name(generator)))
+    lines.append("    return {0};\n}}\n\n".format(name(generator)))
+    return "".join(lines)
+
+
+def nested_blocks(generator):
+    """Returns Python if statements nested dozens of levels deep"""
+    depth = generator.randint(20, 60)
+    lines = ["{0}if {1}:\n".format("    " * level, python_condition(generator)) for level in range(depth)]
+    lines.append("{0}print({1})\n".format("    " * depth, name(generator)))
+    lines.append("\n" * (2 * depth))  # every block needs a blank line of its own to end
+    return "".join(lines)
+
+
+def long_strings(generator):
+    """Returns assignments of long single line, and triple quoted multi-line, strings"""
+    if generator.random() < 0.5:
+        return "var {0} = \"{1} \\\"{2}\\\" {1}\"\n\n".format(name(generator), sentence(generator, 400),
+                                                               sentence(generator, 3))
+    lines = [sentence(generator, 12) for _ in range(generator.randint(20, 80))]
+    return "var {0} = \"\"\"{1}\"\"\"\n\n".format(name(generator), "\n".join(lines))
+
+
+def comments(generator):
+    """Returns code where most lines are comments, some holding text that looks like code or quotes"""
+    lines = []
+    for _ in range(generator.randint(10, 30)):
+        lines.append("# {0} {1}\n".format(sentence(generator, 10), generator.choice(("", "if x: print(y)", "'\"",
+                                                                                    "def f(): pass", "{ } ( )"))))
+    lines.append("{0} = {1}\n\n".format(name(generator), name(generator)))
+    return "".join(lines)
+
+
+def dictionary(generator):
+    """Returns a dictionary literal with hundreds of entries"""
+    entries = ["    '{0}_{1}': {2},\n".format(name(generator), index, generator.choice(("None", "True", "'text'",
+                                                                                     str(index), "[1, 2, 3]")))
+               for index in range(generator.randint(200, 800))]
+    return "var {0} = {{\n{1}}}\n\n".format(name(generator), "".join(entries))
+
+
+CASES = (('python', 'jiphy', 200000, python_function),
+         ('javascript', 'js', 200000, javascript_function),
+         ('nested', 'jiphy', 100000, nested_blocks),
+         ('strings', 'jiphy', 200000, long_strings),
+         ('comments', 'py', 200000, comments),
+         ('dictionaries', 'jiphy', 200000, dictionary),
+         ('large', 'jiphy', 1100000, python_function))
+
+
+def generate(unit, size, seed=0):
+    """Returns code made of units, produced by calling unit with a random generator seeded by seed, until the code is
+       at least size characters long"""
+    generator = random.Random(seed)
+    code = []
+    length = 0
+    while length < size:
+        code.append(unit(generator))
+        length += len(code[-1])
+    return "".join(code)
+
+
+def corpus(seed=0, scale=1.0):
+    """Yields a (name, file extension, code) tuple for every benchmark case, with each case scale times its usual
+       size"""
+    for (case, extension, size, unit) in CASES:
+        yield (case, extension, generate(unit, int(size * scale), seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes jiphy's synthetic benchmark corpus out to a directory")
+    parser.add_argument('directory', help='Where to write the generated files')
+    parser.add_argument('--seed', type=int, default=0, help='Seeds the random generator, changing the code generated')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplies the size of every generated file')
+    arguments = parser.parse_args()
+
+    if not os.path.isdir(arguments.directory):
+        os.makedirs(arguments.directory)
+    for (case, extension, code) in corpus(arguments.seed, arguments.scale):
+        file_name = os.path.join(arguments.directory, "{0}.{1}".format(case, extension))
+        with io.open(file_name, 'w', encoding='utf8') as output:
+            output.write(code)
+        print("{0:40} {1:10} chars".format(file_name, len(code)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""benchmarks/nested_render.py
+
+Times rendering of increasingly deeply nested Python blocks to JavaScript, to show render time grows linearly with
+the size of the code rather than with the number of times each nested block is re-rendered.
+
+Run using: python benchmarks/nested_render.py
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jiphy
+
+
+def nested_blocks(depth):
+    """Returns Python code with the given number of if statements nested within each other"""
+    code = ["{0}if x{1}:\n".format("    " * level, level) for level in range(depth)]
+    code.append("{0}do_something()\n".format("    " * depth))
+    code.append("\n" * (depth + 1))
+    return "".join(code)
+
+
+def render_time(code, repeat=5):
+    """Returns the fastest time taken to render freshly parsed code to JavaScript"""
+    best = None
+    for _ in range(repeat):
+        tree = jiphy.to.ast(code)
+        started = time.time()
+        tree.javascript
+        taken = time.time() - started
+        best = taken if best is None else min(best, taken)
+    return best
+
+
+def main():
+    print("depth      chars    render (ms)    ms / 1k chars")
+    for depth in (5, 10, 20, 40, 80, 160):
+        code = nested_blocks(depth)
+        seconds = render_time(code)
+        print("{0:5} {1:10} {2:14.3f} {3:16.4f}".format(depth, len(code), seconds * 1000,
+                                                        seconds * 1000000 / len(code)))
+
+
+if __name__ == "__main__":
+    main()
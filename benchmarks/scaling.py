@@ -0,0 +1,132 @@
+"""benchmarks/scaling.py
+
+Converts pathological inputs (unterminated strings and comments, unclosed parens, long single line minified code and
+more) at 1x, 2x, 4x and 8x a base size, failing if the time taken grows faster than in proportion to the size of the
+code. The only exceptions are listed, each alongside the reason it is allowed to grow faster, in NESTED_CASES.
+
+Run using: python benchmarks/scaling.py [--size 16000] [--repeat 3] [--case unclosed_paren ...]
+Exits with a non-zero status if the growth of any case, fitted as time ~ size ** exponent, exceeds its limit.
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import gc
+import math
+import os
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+import jiphy
+from corpus import generate, javascript_function, python_function
+
+SCALES = (1, 2, 4, 8)
+LINEAR = 1.25  # allows for timing noise, while quadratic growth shows as an exponent near 2
+NESTED = 2.2  # allows for quadratic growth, along with timing noise
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def minified(code):
+    """Returns JavaScript code on a single line without comments, as a minifier would leave it"""
+    return "".join(line.strip() for line in code.splitlines() if not line.strip().startswith("//"))
+
+
+CASES = (('unterminated_string', LINEAR, lambda size: 'var x = "' + generate(python_function, size)),
+         ('unterminated_triple_string', LINEAR, lambda size: "var x = '''" + generate(python_function, size)),
+         ('unterminated_comment', LINEAR, lambda size: "/* " + generate(javascript_function, size)),
+         ('unclosed_paren', LINEAR, lambda size: "print(" + generate(python_function, size)),
+         ('unfinished_if', LINEAR, lambda size: generate(python_function, size) + "if ("),
+         ('decorators', LINEAR, lambda size: "@decorator\n" * (size // 11) + "def function(a):\n    pass\n\n\n"),
+         ('minified_python', LINEAR, lambda size: "x = [None, True, False, print(y)]; " * (size // 35)),
+         ('minified_javascript', LINEAR, lambda size: minified(generate(javascript_function, size))))
+
+# (case, limit, generator, reason) for every case allowed to grow faster than linearly
+NESTED_CASES = (('nested_parens', NESTED, lambda size: "print(" * (size // 6),
+                 "every paren left open holds the rest of the code, so the output rendered for each joins together "
+                 "the output of all those nested within it"), )
+
+
+def measure(code, repeat=3):
+    """Returns the fewest seconds converting code to JavaScript took, converting it enough times per measurement
+       to take a measurable amount of time. Code is converted once before timing starts, so the routes it needs are
+       already compiled, and garbage collection is held off while timing"""
+    jiphy.to.javascript(code)
+    best = None
+    for _ in range(repeat):
+        (conversions, seconds) = (0, 0.0)
+        while seconds < 0.05:
+            gc.collect()
+            gc.disable()
+            try:
+                started = timer()
+                jiphy.to.javascript(code)
+                seconds += timer() - started
+            finally:
+                gc.enable()
+            conversions += 1
+        best = seconds / conversions if best is None else min(best, seconds / conversions)
+    return best
+
+
+def exponent(sizes, seconds):
+    """Returns the exponent of the power law, seconds ~ sizes ** exponent, best fitting the given measurements"""
+    points = [(math.log(size), math.log(max(taken, 1e-9))) for (size, taken) in zip(sizes, seconds)]
+    mean_size = sum(size for (size, taken) in points) / len(points)
+    mean_taken = sum(taken for (size, taken) in points) / len(points)
+    return (sum((size - mean_size) * (taken - mean_taken) for (size, taken) in points) /
+            sum((size - mean_size) ** 2 for (size, taken) in points))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks jiphy's conversion time grows linearly on pathological input")
+    parser.add_argument('--size', type=int, default=16000, help='The size, in characters, of the smallest input')
+    parser.add_argument('--repeat', type=int, default=3, help='How many times to time each size, keeping the fastest')
+    parser.add_argument('--case', action='append', dest='cases', help='Only run the named case (can be repeated)')
+    arguments = parser.parse_args()
+
+    jiphy.to.converter.warm_up()
+    failed = []
+    print("{0:28}{1}  exponent  limit".format("case", "".join("{0:>11}".format("{0}x".format(scale))
+                                                              for scale in SCALES)))
+    for (case, limit, generator, reason) in [case + (None, ) for case in CASES] + list(NESTED_CASES):
+        if arguments.cases and case not in arguments.cases:
+            continue
+
+        codes = [generator(arguments.size * scale) for scale in SCALES]
+        seconds = [measure(code, arguments.repeat) for code in codes]
+        growth = exponent([len(code) for code in codes], seconds)
+        print("{0:28}{1}{2:10.2f}{3:7.2f}{4}".format(case, "".join("{0:9.1f}ms".format(taken * 1000)
+                                                                 for taken in seconds),
+                                                     growth, limit, growth > limit and "  FAILED" or ""))
+        if reason:
+            print("    allowed to grow faster, as {0}".format(reason))
+        if growth > limit:
+            failed.append(case)
+
+    if failed:
+        print("\ngrowing faster than allowed: {0}".format(", ".join(failed)))
+        sys.exit(1)
+    print("\nall cases grow within their limits")
+
+
+if __name__ == "__main__":
+    main()
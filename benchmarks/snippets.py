@@ -0,0 +1,89 @@
+"""benchmarks/snippets.py
+
+Measures the time taken per snippet to convert many small, distinct snippets (as a template engine converting inline
+code does), calling jiphy.to.javascript once per snippet and passing them all to jiphy.to.javascript_many, which
+reuses a single parser across them. No snippet repeats, so none of the time saved comes from remembering output.
+
+Run using: python benchmarks/snippets.py [--snippets 5000] [--repeat 3]
+Exits with a non-zero status if javascript_many is slower per snippet than converting each snippet on its own.
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+import jiphy
+
+timer = getattr(time, 'perf_counter', time.time)
+TEMPLATES = ("value + {0}\n",
+             "print(item.name, {0})\n",
+             "if count > {0}:\n    total += count\n",
+             "options.get('key_{0}', None) or []\n",
+             "function(element) {{ return element.total > {0}; }}\n",
+             "def handler_{0}(request):\n    return request.data\n\n\n")
+
+
+def snippets(count):
+    """Returns count small snippets, no two of which are the same"""
+    return [TEMPLATES[index % len(TEMPLATES)].format(index) for index in range(count)]
+
+
+def measure(convert, repeat=3):
+    """Returns the fewest seconds convert took to run. Garbage collection is held off while timing"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = timer()
+            convert()
+            taken = timer() - started
+        finally:
+            gc.enable()
+        best = taken if best is None else min(best, taken)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures how fast jiphy converts many small, distinct snippets")
+    parser.add_argument('--snippets', type=int, default=5000, help='How many distinct snippets to convert')
+    parser.add_argument('--repeat', type=int, default=3, help='How many times to time each way, keeping the fastest')
+    arguments = parser.parse_args()
+
+    code = snippets(arguments.snippets)
+    jiphy.to.converter.warm_up()
+    one_at_a_time = measure(lambda: [jiphy.to.javascript(snippet) for snippet in code], arguments.repeat)
+    many = measure(lambda: list(jiphy.to.javascript_many(code)), arguments.repeat)
+    print("one at a time    {0:8.1f} us/snippet".format(one_at_a_time / len(code) * 1000000))
+    print("javascript_many  {0:8.1f} us/snippet ({1:.0%} of the time)".format(many / len(code) * 1000000,
+                                                                            many / one_at_a_time))
+    if many > one_at_a_time:
+        print("\njavascript_many is slower than converting each snippet on its own")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
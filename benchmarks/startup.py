@@ -0,0 +1,96 @@
+"""benchmarks/startup.py
+
+Measures how long jiphy takes to get going, as that dominates when it is called once per file by editor plugins and
+pre-commit hooks: the time taken to import each of its modules (using python -X importtime where available) and the
+time taken for the command line tool to convert a small snippet from start to finish.
+
+Run using: python benchmarks/startup.py [--budget-ms 150]
+Exits with a non-zero status if converting the snippet takes longer than the budget.
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('jiphy', 'jiphy.to', 'jiphy.main')
+SNIPPET = ("import underscore as _\n"
+           "def my_function(test):\n"
+           "    if test:\n"
+           "        print('Hello World!')\n"
+           "\n")
+
+
+def run(arguments, stdin=None):
+    """Runs python with the given arguments against this checkout, returning (seconds taken, stdout, stderr)"""
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    started = time.time()
+    process = subprocess.Popen([sys.executable] + list(arguments), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, env=environment)
+    (output, errors) = process.communicate(stdin and stdin.encode('utf8'))
+    return (time.time() - started, output.decode('utf8'), errors.decode('utf8'))
+
+
+def import_time(module, repeat=5):
+    """Returns the fastest cumulative time, in seconds, taken to import the given module in a fresh interpreter"""
+    best = None
+    for _ in range(repeat):
+        if sys.version_info >= (3, 7):
+            (_, _, errors) = run(('-X', 'importtime', '-c', 'import ' + module))
+            taken = int(errors.strip().splitlines()[-1].split('|')[1]) / 1000000
+        else:
+            taken = run(('-c', 'import ' + module))[0] - run(('-c', 'pass'))[0]
+        best = taken if best is None else min(best, taken)
+    return best
+
+
+def convert_time(repeat=5):
+    """Returns the fastest time, in seconds, taken by the command line tool to convert a small snippet"""
+    best = None
+    for _ in range(repeat):
+        (taken, output, errors) = run(('-m', 'jiphy.main', '-'), stdin=SNIPPET)
+        if errors:
+            raise RuntimeError(errors)
+        best = taken if best is None else min(best, taken)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures jiphy's import and command line startup time")
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help='The longest converting a small snippet from the command line may take')
+    arguments = parser.parse_args()
+
+    print("module            import (ms)")
+    for module in MODULES:
+        print("{0:16} {1:12.1f}".format(module, import_time(module) * 1000))
+
+    taken = convert_time() * 1000
+    print("\ncommand line conversion: {0:.1f} ms (budget {1:.1f} ms)".format(taken, arguments.budget_ms))
+    if taken > arguments.budget_ms:
+        print("over budget!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
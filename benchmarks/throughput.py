@@ -0,0 +1,214 @@
+"""benchmarks/throughput.py
+
+Measures how fast jiphy parses and renders the synthetic corpus generated by benchmarks/corpus.py, converting Python to
+JavaScript and JavaScript to Python, reporting characters and nodes handled per second for parsing and rendering
+separately. Results are compared against a stored baseline so regressions are caught.
+
+Run using: python benchmarks/throughput.py [--baseline benchmarks/baseline.json] [--tolerance 0.25] [--confirm 2]
+                                           [--save]
+Exits with a non-zero status if any case parses or renders slower than its baseline allows, every time it is timed.
+
+Before and after the cases are timed, the speed of a fixed pure Python workload is measured (see calibrate) and the
+slower of the two is kept. The baseline stores it alongside the results. When this machine runs the workload slower
+than the one the baseline was saved on, the throughput expected is lowered to match, so a baseline can be checked on a
+slower machine. It is never raised for a faster one: a single reading of a machine's speed varies too much from run to
+run to demand more than the baseline does, and a check that fails at random can't be trusted. For the same reason a
+case found to be slower is timed again (see --confirm) before it is reported, keeping its fastest throughput.
+
+The comparison is only approximate across machines and Python versions, so after a deliberate change in performance,
+or when the baseline fails on a new machine at the commit it was saved on, regenerate it by running with --save.
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+import jiphy
+from corpus import corpus
+from jiphy.handlers import Handler
+
+BASELINE = os.path.join(BENCHMARKS, 'baseline.json')
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def count_nodes(tree):
+    """Returns the number of handlers within the given tree, including the tree itself"""
+    count = 0
+    handlers = [tree]
+    while handlers:
+        handler = handlers.pop()
+        count += 1
+        handlers.extend(child for child in handler.children if isinstance(child, Handler))
+    return count
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def calibrate(repeat=3):
+    """Returns how many times a second a fixed pure Python workload, splitting and scanning generated code much as
+       parsing it does, can be run on this machine: a measure of its overall speed. The fastest of many runs is
+       kept, as anything else running only ever makes a run slower"""
+    lines = ("def function(value):\n    return value.item(1, 'text')  # comment\n\n" * 2000).splitlines()
+    taken = []
+    for _ in range(repeat * 10):
+        started = timer()
+        for line in lines:
+            [line.find(string) for string in ("(", ")", "'", "#", ":", "return")]
+        taken.append(timer() - started)
+    return 1 / min(taken)
+
+
+def measure(code, language, repeat=3):
+    """Returns the median (parse seconds, render seconds, nodes) found parsing code and rendering it to language
+       repeat times. The median varies far less from one run of the benchmark to the next than the fastest does.
+       Garbage collection is held off while timing"""
+    (parse, render) = ([], [])
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = timer()
+            tree = jiphy.to.ast(code)
+            parsed = timer()
+            jiphy.to.render(tree, language)
+            rendered = timer()
+        finally:
+            gc.enable()
+        parse.append(parsed - started)
+        render.append(rendered - parsed)
+    return (median(parse), median(render), count_nodes(jiphy.to.ast(code)))
+
+
+def benchmark(seed=0, scale=1.0, repeat=3, cases=None):
+    """Returns the throughput of every case in the corpus, or only those named in cases when given, keyed by case
+       then direction (e.g. 'py->js')"""
+    results = {}
+    for (case, extension, code) in corpus(seed, scale):
+        if cases is not None and case not in cases:
+            continue
+        (direction, language) = extension == 'js' and ('js->py', 'python') or ('py->js', 'javascript')
+        (parse, render, nodes) = measure(code, language, repeat)
+        results.setdefault(case, {})[direction] = {
+            'chars': len(code), 'nodes': nodes,
+            'parse_chars_per_second': len(code) / max(parse, 1e-9), 'parse_nodes_per_second': nodes / max(parse, 1e-9),
+            'render_chars_per_second': len(code) / max(render, 1e-9),
+            'render_nodes_per_second': nodes / max(render, 1e-9)}
+    return results
+
+
+def regressions(results, baseline, tolerance, speed=1.0):
+    """Returns a (case, direction, measurement, throughput, expected throughput) tuple for every throughput in results
+       that has dropped by more than tolerance (a fraction) below the same throughput within baseline, once the
+       baseline is scaled by speed: how fast this machine is relative to the one the baseline was saved on. Speeds
+       above 1 are treated as 1, so the baseline is only ever lowered for a slower machine"""
+    speed = min(speed, 1.0)
+    found = []
+    for (case, directions) in sorted(results.items()):
+        for (direction, result) in sorted(directions.items()):
+            expected = baseline.get(case, {}).get(direction, None)
+            if expected is None or expected['chars'] != result['chars']:
+                continue  # not measured before, or measured on different code
+            for measurement in ('parse_chars_per_second', 'render_chars_per_second'):
+                if result[measurement] < expected[measurement] * speed * (1 - tolerance):
+                    found.append((case, direction, measurement, result[measurement], expected[measurement] * speed))
+    return found
+
+
+def keep_fastest(results, retried):
+    """Updates results with every throughput in retried that is higher than the one already held"""
+    for (case, directions) in retried.items():
+        for (direction, result) in directions.items():
+            kept = results[case][direction]
+            for (measurement, value) in result.items():
+                if measurement.endswith('_per_second'):
+                    kept[measurement] = max(kept[measurement], value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures jiphy's parse and render throughput")
+    parser.add_argument('--baseline', default=BASELINE, help='The JSON file holding the baseline to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='How far below its baseline, as a fraction, a throughput may drop before failing')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--seed', type=int, default=0, help='Seeds the corpus generator')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplies the size of every case in the corpus')
+    parser.add_argument('--repeat', type=int, default=5, help='How many times to time each case, keeping the median')
+    parser.add_argument('--confirm', type=int, default=2,
+                        help='How many more times a case is timed before it is reported as slower than its baseline')
+    arguments = parser.parse_args()
+
+    calibration = calibrate(arguments.repeat)
+    results = benchmark(arguments.seed, arguments.scale, arguments.repeat)
+    calibration = min(calibration, calibrate(arguments.repeat))  # before and after, as machines drift in speed
+    print("case          direction      chars     nodes   parse chars/s  parse nodes/s  render chars/s  "
+          "render nodes/s")
+    for (case, directions) in sorted(results.items()):
+        for (direction, result) in sorted(directions.items()):
+            print("{0:13} {1:9} {2:10} {3:9} {4:15,.0f} {5:14,.0f} {6:15,.0f} {7:15,.0f}".format(
+                  case, direction, result['chars'], result['nodes'], result['parse_chars_per_second'],
+                  result['parse_nodes_per_second'], result['render_chars_per_second'],
+                  result['render_nodes_per_second']))
+
+    if arguments.save:
+        with io.open(arguments.baseline, 'w', encoding='utf8') as baseline_file:
+            baseline_file.write(str(json.dumps({'version': jiphy.__version__, 'python': sys.version.split()[0],
+                                                'calibration': calibration, 'results': results},
+                                               indent=1, sort_keys=True)))
+        print("\nbaseline saved to {0}".format(arguments.baseline))
+        return
+
+    if not os.path.exists(arguments.baseline):
+        print("\nno baseline found at {0}, run with --save to store one".format(arguments.baseline))
+        return
+
+    with io.open(arguments.baseline, encoding='utf8') as baseline_file:
+        baseline = json.load(baseline_file)
+    speed = calibration / baseline.get('calibration', calibration)
+    print("\nthis machine runs the calibration workload at {0:.2f}x the speed the baseline was saved at{1}".format(
+          speed, speed > 1 and ", the baseline is checked unscaled" or ""))
+    found = regressions(results, baseline['results'], arguments.tolerance, speed)
+    for _ in range(arguments.confirm):
+        if not found:
+            break
+        cases = set(case for (case, direction, measurement, throughput, expected) in found)
+        print("\ntiming {0} again to confirm it is slower than the baseline allows".format(", ".join(sorted(cases))))
+        keep_fastest(results, benchmark(arguments.seed, arguments.scale, arguments.repeat, cases))
+        found = regressions(results, baseline['results'], arguments.tolerance, speed)
+    if found:
+        print("\nslower than the baseline allows (tolerance {0:.0%}):".format(arguments.tolerance))
+        for (case, direction, measurement, throughput, expected) in found:
+            print("   {0} {1} {2}: {3:,.0f} against a baseline of {4:,.0f}".format(
+                  case, direction, measurement, throughput, expected))
+        sys.exit(1)
+    print("\nno regressions against {0} (tolerance {1:.0%})".format(arguments.baseline, arguments.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,18 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from . import to
+import sys
+from importlib import import_module
 
 __version__ = "1.2.2"
+SUBMODULES = ('aio', 'cache', 'compact', 'handlers', 'manifest', 'parallel', 'parser', 'router', 'segments',
+              'server', 'session', 'stats', 'to')
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """Imports submodules, such as jiphy.to, on first use so importing jiphy alone stays fast"""
+        if name in SUBMODULES:
+            return import_module('.' + name, __name__)
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+else:
+    from . import to
@@ -0,0 +1,103 @@
+"""jiphy/aio.py
+
+Defines an asyncio interface to jiphy, converting code without blocking the event loop (requires Python 3.6 or later)
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import asyncio
+import io
+import os
+from functools import partial
+
+from . import to
+from .pie_slice import *
+
+LANGUAGES = ('javascript', 'python', 'both')
+EXTENSIONS = {'javascript': ('js', ), 'python': ('py', ), 'both': ('js', 'py')}
+get_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)  # only added in Python 3.7
+
+
+def convert_code(code, language):
+    return getattr(to.converter, language)(code)
+
+
+def read_file(path):
+    with io.open(path, encoding='utf8') as source_file:
+        return source_file.read()
+
+
+def write_files(path, output, language):
+    """Writes output next to path, using the extension of the language it was converted to"""
+    outputs = output if language == 'both' else (output, )
+    for (extension, code) in zip(EXTENSIONS[language], outputs):
+        with io.open("{0}.{1}".format(os.path.splitext(path)[0], extension), 'w', encoding='utf8') as output_file:
+            output_file.write(code)
+
+
+async def convert(code, language='javascript', executor=None, converter=None):
+    """Converts code into the given language ('javascript', 'python' or 'both') within executor, the event loop's
+       default executor unless one is given, returning a (JavaScript, Python) pair for both.
+
+       A process pool executor converts code in parallel, without competing with the event loop for the GIL, but can
+       only use the default converter. Cancelling stops waiting on the conversion, dropping it if not yet started.
+    """
+    if language not in LANGUAGES:
+        raise ValueError("Can not convert to {0}, only to one of {1}".format(language, ", ".join(LANGUAGES)))
+
+    loop = get_running_loop()
+    if converter is None:
+        return await loop.run_in_executor(executor, convert_code, code, language)
+    return await loop.run_in_executor(executor, getattr(converter, language), code)
+
+
+async def convert_path(path, language, executor, converter, write):
+    loop = get_running_loop()
+    code = await loop.run_in_executor(executor, read_file, path)
+    output = await convert(code, language, executor, converter)
+    if write:
+        await loop.run_in_executor(executor, partial(write_files, path, output, language))
+    return (path, output)
+
+
+async def convert_many(paths, language='javascript', executor=None, converter=None, concurrency=8, write=False):
+    """Converts the files at each of the given paths, yielding a (path, output) pair for each as it finishes.
+
+       No more than concurrency files are read, converted or written at once, and paths is only consumed as fast as
+       that allows, so it can be a generator over any number of files. Files are read and, when write is True, written
+       next to the original with the extension of the language converted to, within executor. If one fails, or
+       iterating stops early or is cancelled, every conversion still pending is cancelled.
+    """
+    paths = iter(paths)
+    pending = set()
+    try:
+        while True:
+            for path in paths:
+                pending.add(asyncio.ensure_future(convert_path(path, language, executor, converter, write)))
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+
+            (done, pending) = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
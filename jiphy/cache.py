@@ -0,0 +1,133 @@
+"""jiphy/cache.py
+
+Defines a content addressed cache of converted segments, so code shared between files is only converted once
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+from . import __version__
+from .pie_slice import *
+
+
+class SegmentCache(object):
+    """A bounded, least recently used, cache of converted segments kept in memory and, when a directory is given,
+       on disk as well.
+
+       Entries are keyed by a hash of the segment's text, the language it was converted to, the routes used and the
+       version of jiphy, so changing any of them never returns stale output. Each entry records whether the segment
+       parsed without leaving anything open and, if it was needed, its output. The in memory cache holds up to size
+       entries, the directory up to around disk_size: whenever another quarter of disk_size entries has been written
+       the least recently used entries beyond it are removed (see prune).
+    """
+    __slots__ = ('size', 'directory', 'disk_size', 'entries', 'hits', 'misses', 'written')
+
+    def __init__(self, size=1024, directory=None, disk_size=65536):
+        self.size = size
+        self.directory = directory
+        self.disk_size = disk_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+
+    def key(self, text, language, routes=''):
+        return hashlib.sha1("\0".join((__version__, language, routes, text)).encode('utf8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".json")
+
+    def get(self, key):
+        """Returns the (closed, output) entry for the given key, or None if it has not been cached"""
+        entry = self.entries.pop(key, None)
+        if entry is None and self.directory:
+            try:
+                with io.open(self.path(key), encoding='utf8') as entry_file:
+                    entry = tuple(json.load(entry_file))
+                os.utime(self.path(key), None)  # marks the entry as recently used, so prune keeps it
+            except (IOError, OSError, ValueError):
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.remember(key, entry)
+        return entry
+
+    def set(self, key, entry):
+        """Stores the given (closed, output) entry under key"""
+        self.remember(key, entry)
+        if self.directory:
+            path = self.path(key)
+            if not os.path.isdir(os.path.dirname(path)):
+                try:
+                    os.makedirs(os.path.dirname(path))
+                except OSError:  # created at the same time by another process
+                    pass
+            (handle, temporary_path) = tempfile.mkstemp(dir=os.path.dirname(path))
+            with io.open(handle, 'w', encoding='utf8') as entry_file:
+                entry_file.write(str(json.dumps(list(entry))))
+            getattr(os, 'replace', os.rename)(temporary_path, path)
+            self.written += 1
+            if self.written > self.disk_size // 4:
+                self.prune()
+
+    def prune(self, keep=None):
+        """Removes all but the keep (by default disk_size) most recently used entries from the directory, returning
+           how many were removed"""
+        keep = self.disk_size if keep is None else keep
+        self.written = 0
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+
+        used = []
+        for (directory, _, file_names) in os.walk(self.directory):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                try:
+                    used.append((os.path.getmtime(path), path))
+                except OSError:  # removed at the same time by another process
+                    pass
+
+        used.sort(reverse=True)
+        for (_, path) in used[keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return max(len(used) - keep, 0)
+
+    def remember(self, key, entry):
+        self.entries.pop(key, None)
+        self.entries[key] = entry
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,365 @@
+"""jiphy/compact.py
+
+Defines a compact, array backed, representation of the pseudo AST for holding on to large parsed files
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from array import array
+
+from .handlers import AbstractHandler, PassThrough
+from .pie_slice import *
+from .to import render
+
+HANDLER_ATTRIBUTES = ('parent', 'index', 'parser', 'children', 'started_on', 'started_at', 'start_index', 'ended_on',
+                      'ended_at', 'rendered')
+
+
+class NodeTable(object):
+    """Stores a tree of handlers as parallel arrays indexed by node id, with nodes numbered in the order they appear.
+
+       Each node's shape (its handler class along with the strings it started and ended on) and any extra attributes
+       a handler set on itself while parsing (such as a block's indent) are interned. Plain text is kept as offsets
+       into the parsed code and each node only refers to its parent by id, so no reference cycles are created.
+    """
+    __slots__ = ('parser', 'shapes', 'extras', 'shape_ids', 'extra_ids', 'node_shapes', 'parents', 'positions',
+                 'sizes', 'started_at', 'ended_at', 'node_extras')
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.shapes = []
+        self.extras = [{}]
+        self.shape_ids = {}
+        self.extra_ids = {}
+        self.node_shapes = array('H')
+        self.parents = array('i')
+        self.positions = array('I')
+        self.sizes = array('I')
+        self.started_at = array('i')
+        self.ended_at = array('i')
+        self.node_extras = array('I')
+
+    @classmethod
+    def from_handler(cls, root):
+        """Returns a table holding the given, already parsed, handler and everything nested within it"""
+        table = cls(root.parser)
+        handlers = [(False, root, -1, 0)]
+        while handlers:
+            (ended, handler, parent, position) = handlers.pop()
+            if ended:
+                table.close(handler, parent)
+                continue
+
+            node = table.add(handler, parent, position)
+            handlers.append((True, handler, node, position))
+            handlers.extend((False, child, node, child_position) for (child_position, child)
+                            in reversed(list(enumerate(handler.children))))
+        return table
+
+    def fill(self, root, routes):
+        """Parses the content of root, using the given RouteTable, adding it and every handler within it as found.
+
+           Handlers are only kept while their own content is still being parsed: everything they contain is added to
+           the table, and dropped, as soon as it is found, so the full tree of handlers is never held at once.
+        """
+        nodes = [self.add(root, -1, 0)]
+        counts = [0]
+        stack = [root]
+        if not root.begin():
+            stack = []
+            self.add_children(root, nodes[-1], counts)
+            self.close(root, nodes[-1])
+
+        while stack:
+            handler = stack[-1]
+            child = handler.advance(routes)
+            if child is None:
+                self.add_children(handler, nodes[-1], counts)
+                self.close(handler, nodes.pop())
+                counts.pop()
+                stack.pop()
+                continue
+
+            handler.children.pop()
+            self.add_children(handler, nodes[-1], counts)
+            node = self.add(child, nodes[-1], counts[-1])
+            counts[-1] += 1
+            if child.begin():
+                nodes.append(node)
+                counts.append(0)
+                stack.append(child)
+            else:
+                self.add_children(child, node, [0])
+                self.close(child, node)
+
+    def add_children(self, handler, parent, counts):
+        """Adds the children handler has gathered so far as nodes within parent, taking them from handler"""
+        for child in handler.children:
+            self.close(child, self.add(child, parent, counts[-1]))
+            counts[-1] += 1
+        del handler.children[:]
+
+    def intern(self, value, values, ids, key=None):
+        key = value if key is None else key
+        value_id = ids.get(key, None)
+        if value_id is None:
+            value_id = ids[key] = len(values)
+            values.append(value)
+        return value_id
+
+    def intern_shape(self, kind, started_on, ended_on):
+        shape = (kind, started_on, ended_on)
+        return self.intern(shape, self.shapes, self.shape_ids)
+
+    def intern_extras(self, extras):
+        if not extras:
+            return 0
+        return self.intern(extras, self.extras, self.extra_ids, tuple(sorted(itemsview(extras))))
+
+    def add(self, handler, parent, position):
+        """Adds a single node for the given handler as the child of parent at position, returning its id.
+           Where a handler ends is only recorded once it is closed"""
+        node = len(self)
+        self.parents.append(parent)
+        self.positions.append(position)
+        self.sizes.append(1)
+        if isinstance(handler, PassThrough):
+            self.node_shapes.append(self.intern_shape(type(handler), '', ''))
+            self.started_at.append(handler.start)
+            self.ended_at.append(handler.end)
+            self.node_extras.append(self.intern_extras(handler.source is not self.parser.code and
+                                                       {'source': handler.source} or None))
+            return node
+
+        self.node_shapes.append(self.intern_shape(type(handler), handler.started_on, ''))
+        self.started_at.append(handler.started_at)
+        self.ended_at.append(0)
+        self.node_extras.append(0)
+        return node
+
+    def close(self, handler, node):
+        """Records where the handler for node ended, once everything within it has been added"""
+        self.sizes[node] = len(self) - node
+        if isinstance(handler, PassThrough):
+            return
+
+        self.ended_at[node] = handler.ended_at
+        self.node_shapes[node] = self.intern_shape(type(handler), handler.started_on, handler.ended_on)
+        self.node_extras[node] = self.intern_extras(dict((key, value) for (key, value) in itemsview(vars(handler))
+                                                         if key not in HANDLER_ATTRIBUTES))
+
+    def __len__(self):
+        return len(self.node_shapes)
+
+    def __getitem__(self, node):
+        return Node(self, node)
+
+    @property
+    def root(self):
+        return Node(self, 0)
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the arrays holding every node"""
+        return sum(len(column) * column.itemsize for column in (self.node_shapes, self.parents, self.positions,
+                                                                self.sizes, self.started_at, self.ended_at,
+                                                                self.node_extras))
+
+    def counts(self):
+        """Returns how many nodes were created by each handler class, keyed by class name"""
+        counts = {}
+        for shape in self.node_shapes:
+            name = self.shapes[shape][0].__name__
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def children(self, node):
+        """Returns the ids of the direct children of the given node"""
+        children = []
+        child = node + 1
+        end = node + self.sizes[node]
+        while child < end:
+            children.append(child)
+            child += self.sizes[child]
+        return children
+
+    def build(self, node, parent):
+        """Returns a new handler for the given node alone, added as the last child of parent when there is one"""
+        (kind, started_on, ended_on) = self.shapes[self.node_shapes[node]]
+        extras = self.extras[self.node_extras[node]]
+        if issubclass(kind, PassThrough):
+            handler = kind(extras.get('source', self.parser.code), parent, self.started_at[node], self.ended_at[node])
+        else:
+            handler = kind.__new__(kind)
+            AbstractHandler.__init__(handler, parent)
+            handler.parser = self.parser
+            handler.children = []
+            handler.started_on = started_on
+            handler.started_at = self.started_at[node]
+            handler.start_index = handler.started_at - len(started_on) + 1
+            handler.ended_on = ended_on
+            handler.ended_at = self.ended_at[node]
+            for key, value in itemsview(extras):
+                setattr(handler, key, value)
+        if parent is not None:
+            parent.children.append(handler)
+        return handler
+
+    def materialize(self, node=0):
+        """Rebuilds the handler for node along with everything nested within it, returning it.
+
+           Handlers look at their parent, and the handler before them along with its last child, while rendering, so
+           those are rebuilt too, on their own. Any other siblings are left as None, keeping the handler's index.
+        """
+        parent = None
+        parent_node = self.parents[node]
+        if parent_node >= 0:
+            parent = self.build(parent_node, None)
+            position = self.positions[node]
+            if position:
+                parent.children.extend([None] * (position - 1))
+                previous = Node(self, node).prev.id
+                previous_handler = self.build(previous, parent)
+                if self.sizes[previous] > 1:
+                    self.build(self.children(previous)[-1], previous_handler)
+
+        handlers = [self.build(node, parent)]
+        for nested in range(node + 1, node + self.sizes[node]):
+            handlers.append(self.build(nested, handlers[self.parents[nested] - node]))
+        return handlers[0]
+
+
+class Node(object):
+    """A lightweight view onto a single node of a NodeTable, exposing the same interface as a Handler"""
+    __slots__ = ('table', 'id')
+
+    def __init__(self, table, node):
+        self.table = table
+        self.id = node
+
+    @property
+    def handler(self):
+        """The handler class this node was created by"""
+        return self.table.shapes[self.table.node_shapes[self.id]][0]
+
+    @property
+    def parent(self):
+        parent = self.table.parents[self.id]
+        return Node(self.table, parent) if parent >= 0 else None
+
+    @property
+    def children(self):
+        return [Node(self.table, child) for child in self.table.children(self.id)]
+
+    @property
+    def index(self):
+        return self.table.positions[self.id]
+
+    @property
+    def prev(self):
+        table = self.table
+        parent = table.parents[self.id]
+        if parent >= 0 and table.positions[self.id] > 0:
+            node = self.id - 1  # either the sibling before, or the last node nested within it
+            while table.parents[node] != parent:
+                node = table.parents[node]
+            return Node(table, node)
+
+    @property
+    def next(self):
+        table = self.table
+        parent = table.parents[self.id]
+        if parent >= 0:
+            node = self.id + table.sizes[self.id]
+            if node < parent + table.sizes[parent]:
+                return Node(table, node)
+
+    @property
+    def last_child(self):
+        children = self.children
+        return children and children[-1]
+
+    @property
+    def started_on(self):
+        return self.table.shapes[self.table.node_shapes[self.id]][1]
+
+    @property
+    def ended_on(self):
+        return self.table.shapes[self.table.node_shapes[self.id]][2]
+
+    @property
+    def started_at(self):
+        return self.table.started_at[self.id]
+
+    @property
+    def ended_at(self):
+        return self.table.ended_at[self.id]
+
+    @property
+    def code(self):
+        """The text of a plain text node"""
+        source = self.table.extras[self.table.node_extras[self.id]].get('source', self.table.parser.code)
+        return source[self.started_at:self.ended_at]
+
+    @property
+    def parser(self):
+        return self.table.parser
+
+    @property
+    def javascript(self):
+        return render(self.table.materialize(self.id), 'javascript')
+
+    @property
+    def python(self):
+        return render(self.table.materialize(self.id), 'python')
+
+    def __getattr__(self, name):
+        extras = self.table.extras[self.table.node_extras[self.id]]
+        if name in extras:
+            return extras[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, index):
+        return self.children[index]
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and other.table is self.table and other.id == self.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.table), self.id))
+
+    def __repr__(self):
+        self_representation = "{0}({1})".format(self.handler.__name__, self.index)
+        if self.started_on:
+            self_representation = "{0} <-- {1}".format(self_representation, self.started_on)
+
+        representation = [self_representation]
+        for child in self:
+            for index, line in enumerate(repr(child).split("\n")):
+                if index == 0:
+                    representation.append("|---" + line)
+                else:
+                    representation.append("|  " + line)
+        return "\n".join(representation)
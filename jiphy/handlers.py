@@ -21,10 +21,37 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import threading
+
 from .pie_slice import *
-from .router import Router
+from .router import Router, RouteTable
 
 routes = Router()
+route_table = RouteTable()
+RENDER_DEPTH = 50
+
+
+class RenderPass(threading.local):
+    """Tracks the handlers keeping rendered output during the render currently running on this thread, so that
+       output is reused within a single render, but never from one render to the next"""
+    kept = None
+
+    def begin(self):
+        """Starts a render pass, returning False if one was already running"""
+        if self.kept is not None:
+            return False
+
+        self.kept = []
+        return True
+
+    def end(self):
+        """Drops the output kept by every handler rendered since the pass began"""
+        for handler in self.kept:
+            handler.rendered = None
+        self.kept = None
+
+
+render_pass = RenderPass()
 
 
 class AbstractHandler(object):
@@ -80,23 +107,22 @@ class Handler(AbstractHandler):
     yield_for = ()
     accept_children = routes
     back_track = 0
+    rendered = None
+    depth = None  # the most levels of handlers nested within this one, when known (as it is for the trees parsed)
+    stats = None
 
-    def __init__(self, parser, started_on='', started_at=0, parent=None):
+    def __init__(self, parser, started_on='', started_at=0, parent=None, routes=None, table=None):
         AbstractHandler.__init__(self, parent)
         self.parser = parser
-        self.index = parent and len(parent.children) or 0
         self.children = []
         self.started_on = started_on
         self.started_at = started_at
         self.start_index = started_at - len(started_on) + 1
         self.ended_on = ''
         self.ended_at = 0
-        if isinstance(self.end_on, str):
-            self.end_on = (self.end_on, )
-        if isinstance(self.yield_for, str):
-            self.yield_for = (self.yield_for, )
 
-        self.start()
+        if parent is None:
+            self.start(routes, table)
 
     def __getitem__(self, index):
         return self.children[index]
@@ -108,34 +134,84 @@ class Handler(AbstractHandler):
     def last_child(self):
         return self.children and self.children[-1]
 
-    def start(self):
-        self.handle()
-        if not self.end_on and self.parent:
-            self.parser -= self.back_track or 0
-            self.ended_at = self.parser.index
+    def start(self, routes=None, table=None):
+        """Parses the content of this handler and everything nested within it, using the given RouteTable.
+
+           Nested handlers are kept on an explicit stack instead of the call stack, so the depth of nesting within the
+           code is not limited by Python's recursion limit. When a compact NodeTable is given, everything parsed is
+           added to it instead of being kept as children.
+        """
+        routes = routes or route_table
+        routes.refresh()
+        if table is not None:
+            table.fill(self, routes)
             return
 
-        while self.parser.more:
-            (text, matched) = self.parser.text_till(self.yield_for + self.end_on + self.accept_children.match_on)
-            if text:
-                self.children.append(PassThrough(text, self))
-            if matched in self.end_on:
-                self.parser += len(matched) - 1
+        if not self.begin():
+            return
+
+        stack = [self]
+        depth = 0
+        while stack:
+            child = stack[-1].advance(routes)
+            if child is None:
+                stack.pop()
+                continue
+
+            if len(stack) > depth:
+                depth = len(stack)
+            if child.begin():
+                stack.append(child)
+        self.depth = depth
+
+    def begin(self):
+        """Called once a handler is matched, returns True if it has content of its own to parse"""
+        self.handle()
+        if not self.end_on and self.parent:
+            self.finish()
+            return False
+
+        return True
+
+    def advance(self, routes):
+        """Parses until the next nested handler is matched, returning it, or this handler ends, returning None"""
+        parser = self.parser
+        compiled = routes.compiled.get(type(self), None) or routes[type(self)]
+        while parser.more:
+            (start, end, matched) = parser.span_till(compiled.stop_on)
+            if end > start:
+                self.children.append(PassThrough(parser.code, self, start, end))
+            if matched in compiled.end_on:
+                parser += len(matched) - 1
                 self.ended_on = matched
                 break
 
             if not matched:
                 break
 
-            handler = self.accept_children.get(matched, None)
-            if handler:
-                self.parser += len(matched) - 1
-                self.children.append(handler(self.parser, matched, self.parser.index - 1, parent=self))
-                handler.ended_at = self.parser.index
-            else:
+            handler = compiled.dispatch.get(matched, None)
+            if not handler:
                 raise NotImplementedError('There is no support to handle ' + matched)
 
-        self.parser -= self.back_track or 0
+            parser += len(matched) - 1
+            child = handler(parser, matched, parser.index - 1, parent=self)
+            self.children.append(child)
+            return child
+
+        self.finish()
+        return None
+
+    def finish(self):
+        back_track = self.back_track
+        if back_track:
+            # never back into the route this handler started on: matching it again would never end, and matching
+            # only its end again would repeat it in the output
+            parsed = self.parser.index - self.started_at
+            if back_track > parsed:
+                back_track = parsed - 1
+            self.parser -= back_track
+            if self.stats is not None:
+                self.stats.back_track(self, back_track)
         self.ended_at = self.parser.index
 
     @property
@@ -154,7 +230,7 @@ class Handler(AbstractHandler):
 
     @property
     def javascript(self):
-        return self._javascript()
+        return self.render('javascript', self._javascript)
 
     @property
     def python_content(self):
@@ -165,7 +241,72 @@ class Handler(AbstractHandler):
 
     @property
     def python(self):
-        return self._python()
+        return self.render('python', self._python)
+
+    def render(self, language, renderer):
+        """Returns the output of the given renderer, reusing the output already rendered for language during the
+           current render pass. Output is only kept until the outermost render finishes, so changes made to the tree
+           between renders, including to the siblings a handler's output depends on, are always reflected."""
+        rendered = self.rendered
+        if rendered is not None and language in rendered:
+            return rendered[language]
+
+        kept = render_pass.kept
+        if kept is None:
+            render_pass.begin()
+            try:
+                return renderer()
+            finally:
+                render_pass.end()
+
+        output = renderer()
+        if self.rendered is None:
+            self.rendered = {}
+            kept.append(self)
+        self.rendered[language] = output
+        return output
+
+    def render_nested(self, language):
+        """Returns the output for language, having first rendered the handlers nested a multiple of RENDER_DEPTH levels
+           within this one, the most deeply nested first, so rendering never recurses more than RENDER_DEPTH levels
+           at once however deeply the code is nested.
+
+           Every handler's output includes the output of those within it, so once a band of RENDER_DEPTH levels has
+           been rendered the output kept by the band below it is dropped, keeping memory in proportion to the code.
+           When the tree this handler belongs to is known to nest fewer levels than that, it is rendered directly.
+        """
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        if root.depth is not None and root.depth < RENDER_DEPTH:
+            return getattr(self, language)
+
+        began = render_pass.begin()
+        try:
+            (heads, bands) = ([], [])
+            handlers = [(self, 0)]
+            while handlers:
+                (handler, depth) = handlers.pop()
+                band = depth // RENDER_DEPTH
+                if band:
+                    while len(bands) < band:
+                        heads.append([])
+                        bands.append([])
+                    bands[band - 1].append(handler)
+                    if not depth % RENDER_DEPTH:
+                        heads[band - 1].append(handler)
+                handlers.extend((child, depth + 1) for child in handler.children if isinstance(child, Handler))
+
+            for band in reversed(range(len(bands))):
+                for handler in heads[band]:
+                    getattr(handler, language)
+                if band + 1 < len(bands):
+                    for handler in bands[band + 1]:
+                        handler.rendered = None
+            return getattr(self, language)
+        finally:
+            if began:
+                render_pass.end()
 
     def behind(self, amount=1):
         return self.parser.behind(self.started_at, amount)
@@ -181,11 +322,18 @@ class Handler(AbstractHandler):
 
 
 class PassThrough(AbstractHandler):
-    __slots__ = ('code')
+    """Text that is output unchanged, kept as a (start, end) span of source until it is rendered"""
+    __slots__ = ('source', 'start', 'end')
 
-    def __init__(self, code, parent):
+    def __init__(self, source, parent, start=0, end=None):
         AbstractHandler.__init__(self, parent)
-        self.code = code
+        self.source = source
+        self.start = start
+        self.end = len(source) if end is None else end
+
+    @property
+    def code(self):
+        return self.source[self.start:self.end]
 
     @property
     def javascript(self):
@@ -199,8 +347,10 @@ class PassThrough(AbstractHandler):
 @routes.add('\\')
 class Escape(Handler):
 
-    def start(self):
-        self.children.append(PassThrough(self.parser.pop(), self))
+    def begin(self):
+        self.parser.pop()
+        self.children.append(PassThrough(self.parser.code, self, self.parser.index - 1, self.parser.index))
+        return False
 
 
 class MultiLineComment(Handler):
@@ -312,10 +462,11 @@ class PythonImport(Handler):
         else:
             variable_name = to_import.split("/")[-1]
 
-        if self.ended_on == " #":
-            self.ended_on = " "
+        ended_on = self.ended_on
+        if ended_on == " #":
+            ended_on = " "
 
-        return "var {0} = require('{1}');{2}".format(variable_name, to_import, self.ended_on)
+        return "var {0} = require('{1}');{2}".format(variable_name, to_import, ended_on)
 
 
 @routes.add("): pass\n", ") {}\n")
@@ -488,13 +639,7 @@ class ElseStatement(Handler):
 class Block(Handler):
 
     def handle(self):
-        self.indent = ''
-        line = self.parser.text_after(self.started_at - 2, '\n')
-        for character in line:
-            if character in (" ", "\t"):
-                self.indent += character
-            else:
-                break
+        self.indent = self.parser.indentation(self.started_at - 2)
 
 
 @routes.add('):\n', ':\n')
@@ -521,7 +666,6 @@ class PythonBlock(Block):
             last_child_index = len(self.children) - 1
             while (not self.children[last_child_index].javascript.strip() and not
                    isinstance(last_child, PythonNoop) and last_child_index > 0):
-                self.children[last_child_index] = PassThrough('', self)
                 last_child_index -= 1
             last_child = self.children[last_child_index]
         if isinstance(last_child, PythonBlock) and last_child.javascript.endswith("\n"):
@@ -731,8 +875,9 @@ class Decorator(Handler):
     end_on = ('\n', ')\n')
 
     def handle(self):
-        (parts, _) = self.parser.text_till(("("), keep_index=True)
-        self.function_name = parts.split()[-1]
+        self.function_name = self.parser.word_before("(")
+        if not self.function_name:
+            raise IndexError("There is no function name before the decorator's arguments")
 
     def _javascript(self):
         return "{1} = {0}({1});\n".format(Handler._javascript(self)[1:-1], self.function_name)
@@ -23,11 +23,12 @@ OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import argparse
+import json
 import os
 import sys
+import time
 from argparse import RawTextHelpFormatter
-from datetime import datetime
-from difflib import unified_diff
+from io import StringIO
 
 import jiphy
 
@@ -61,6 +62,8 @@ INTRO = """
 
 """.format(__version__)
 
+CONVERSION_OPTIONS = ('out_lang', 'out_ext', 'out_dir', 'conform')
+
 
 def iter_source_code(paths, in_ext="py"):
     """Iterate over all Python source files defined in paths."""
@@ -74,11 +77,190 @@ def iter_source_code(paths, in_ext="py"):
             yield path
 
 
+def convert_file(file_name, arguments, jobs=1):
+    """Converts a single file as directed by the command line arguments, returning the names of the files written
+       (or that would have been written when producing a diff) alongside what should be logged to the console.
+
+       Files large enough to be cut into several chunks are converted using up to jobs processes at once.
+    """
+    log = []
+    temporary_paths = []
+    with open(file_name) as input_file:
+        input_code = input_file.read()
+        out_lang = arguments['out_lang']
+        if not out_lang:
+            out_lang = file_name.split(".")[-1].lower()
+            if out_lang in ("py", "js"):
+                if not arguments['conform']:
+                    if out_lang == "py":
+                        out_lang = "js"
+                    else:
+                        out_lang = "py"
+            else:
+                out_lang = "js"
+
+        from . import parallel  # only needed when converting, so kept out of startup
+
+        if jobs != 1 and len(input_code) > 2 * parallel.CHUNK_SIZE:
+            out_langs = out_lang == 'both' and ('js', 'py') or (out_lang, )
+            language = {'both': 'both', 'py': 'python'}.get(out_lang, 'javascript')
+            output_code = parallel.convert(input_code, language, jobs)
+            output_code = (output_code if out_lang == 'both' else (output_code, ), )
+        elif out_lang == 'both':
+            out_langs = ('js', 'py')
+            output_code = jiphy.to.both_chunks(input_code)
+        elif out_lang == 'py':
+            out_langs = ('py', )
+            output_code = ((chunk, ) for chunk in jiphy.to.python_chunks(input_code))
+        else:
+            out_langs = ('js', )
+            output_code = ((chunk, ) for chunk in jiphy.to.javascript_chunks(input_code))
+
+        file_name_parts = file_name.split('.')
+        output_file_names = []
+        for lang in out_langs:
+            output_file_names.append("{0}{1}.{2}".format(arguments['out_dir'], ".".join(file_name_parts[:-1]),
+                                                         len(out_langs) == 1 and arguments['out_ext'] or lang))
+        if arguments['diff']:
+            outputs = [StringIO() for lang in out_langs]
+            stripped_outputs = [jiphy.to.StrippedOutput(output, end_with_newline=False) for output in outputs]
+        else:
+            for lang, output_file_name in zip(out_langs, output_file_names):
+                log.append("   |-> [{2}]: {3} '{0}' -> '{1}' in a Jiphy!\n".format(file_name, output_file_name,
+                           lang.upper(), arguments['conform'] and "Conforming" or "Converting"))
+            outputs = []
+            stripped_outputs = []
+
+        try:
+            if not arguments['diff']:
+                for output_file_name in output_file_names:
+                    outputs.append(open(output_file_name + '.partial', 'w'))
+                    temporary_paths.append(output_file_name + '.partial')
+                    stripped_outputs.append(jiphy.to.StrippedOutput(outputs[-1]))
+
+            for chunks in output_code:
+                for stripped_output, chunk in zip(stripped_outputs, chunks):
+                    stripped_output.write(chunk)
+            for stripped_output in stripped_outputs:
+                stripped_output.close()
+        except BaseException:  # leave any existing output in place, rather than a partially written file
+            for output in outputs:
+                output.close()
+            for temporary_path in temporary_paths:
+                os.remove(temporary_path)
+            raise
+
+        if arguments['diff']:
+            from datetime import datetime  # only needed for diffs, so kept out of startup
+            from difflib import unified_diff
+
+            for output, output_file_name in zip(outputs, output_file_names):
+                for line in unified_diff(input_code.splitlines(1),
+                                         output.getvalue().splitlines(1),
+                                         fromfile=file_name + ':before',
+                                         tofile=output_file_name + ':after',
+                                         fromfiledate=str(datetime.fromtimestamp(os.path.getmtime(file_name))),
+                                         tofiledate=str(datetime.now())):
+                    log.append(line)
+        else:
+            for output, temporary_path, output_file_name in zip(outputs, temporary_paths, output_file_names):
+                output.close()
+                getattr(os, 'replace', os.rename)(temporary_path, output_file_name)
+
+    return (output_file_names, "".join(log))
+
+
+def file_size(file_name):
+    try:
+        return os.path.getsize(file_name)
+    except OSError:
+        return 0
+
+
+def convert_files(file_names, arguments, jobs=1):
+    """Converts every one of the given files, using up to jobs processes at once, yielding the
+       (output file names, log) of each in the order they were given.
+
+       When converting in parallel the largest files are started first, so a large file started last can't hold
+       up the rest, while what is logged is still collected and yielded in order.
+    """
+    if jobs == 1 or len(file_names) < 2:
+        for file_name in file_names:
+            yield convert_file(file_name, arguments, jobs)
+        return
+
+    import multiprocessing
+
+    pool = multiprocessing.Pool(min(jobs or multiprocessing.cpu_count(), len(file_names)))
+    try:
+        results = {}
+        for index in sorted(range(len(file_names)), key=lambda index: file_size(file_names[index]), reverse=True):
+            results[index] = pool.apply_async(convert_file, (file_names[index], arguments))
+        for index in range(len(file_names)):
+            yield results[index].get()
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def file_stats(file_names):
+    """Returns the (modification time, size) of each of the given files that still exists"""
+    stats = {}
+    for file_name in file_names:
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            continue
+        stats[file_name] = (stat.st_mtime, stat.st_size)
+    return stats
+
+
+def watch_files(paths, arguments, stats, manifest=None, interval=0.5, debounce=0.1):
+    """Watches the given paths for files created or modified since their stats were taken, converting each as it
+       changes and yielding its (file name, output file names, log, seconds taken to convert), forever.
+
+       The paths are polled every interval seconds, being walked again each time when recursive so new files are
+       picked up. Changed files are only converted once nothing has changed for debounce seconds, so a file still
+       being saved isn't converted half written. A file that fails to convert is logged rather than ending the watch.
+    """
+    def discover():
+        return arguments.get('recursive', False) and iter_source_code(paths, arguments['in_ext']) or paths
+
+    while True:
+        time.sleep(interval)
+        current = file_stats(discover())
+        while current != stats:
+            time.sleep(debounce)
+            (settled, current) = (current, file_stats(discover()))
+            if settled == current:
+                break
+
+        changed = sorted(file_name for (file_name, stat) in itemsview(current) if stats.get(file_name) != stat)
+        for file_name in changed:
+            started = time.time()
+            try:
+                (output_file_names, log) = convert_file(file_name, arguments, arguments['jobs'])
+            except Exception as exception:
+                (output_file_names, log) = (None, "   |-> [ERROR]: '{0}' could not be converted: {1}\n".format(
+                                            file_name, exception))
+            yield (file_name, output_file_names, log, time.time() - started)
+            if manifest and output_file_names is not None:
+                manifest.record(file_name, output_file_names)
+        if changed and manifest:
+            manifest.save()
+        current.update(file_stats(changed))  # converting a file into itself, when conforming, changes it again
+        stats = current
+
+
 def main():
     parser = argparse.ArgumentParser(description=INTRO, formatter_class=RawTextHelpFormatter)
-    parser.add_argument('files', nargs='+', help='One or more source files that you would like converted.')
-    parser.add_argument('-o', '--out-lang', help='Specify the desired output language. Defaults to JavaScript.',
-                        dest='out_lang', type=str, choices=("py", "js"), default="")
+    parser.add_argument('files', nargs='*', help='One or more source files that you would like converted.')
+    parser.add_argument('-o', '--out-lang', help='Specify the desired output language, or both to output JavaScript '
+                        'and Python side by side. Defaults to JavaScript.',
+                        dest='out_lang', type=str, choices=("py", "js", "both"), default="")
     parser.add_argument('-e', '--out-ext', help='Specify the desired output files extension (such as py or js). '
                         'Default is baesd on lang', dest='out_ext', type=str,)
     parser.add_argument('-i' '--in-ext', help='Specify the extension of the files to parse. Defualt is .jiphy',
@@ -92,65 +274,115 @@ def main():
                              "without actually performing any changes")
     parser.add_argument('-c', '--conform', dest='conform', default=False, action='store_true',
                         help="Conform all code within passed in files to the format implied by its extension")
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1,
+                        help="Convert up to this many files at once, each in its own process. "
+                             "0 uses one process per CPU")
+    parser.add_argument('--cache-dir', dest='cache_dir', default="",
+                        help="Keep a manifest of converted files within this directory, skipping files that are "
+                             "unchanged since they were last converted")
+    parser.add_argument('-w', '--watch', dest='watch', default=False, action='store_true',
+                        help="Keep running after converting the given files, converting them again whenever they "
+                             "change (as well as any new files, when recursive)")
+    parser.add_argument('--serve', dest='serve', default=False, action='store_true',
+                        help="Run as a long lived server answering line delimited JSON conversion requests, "
+                             "for editor integrations")
+    parser.add_argument('--socket', dest='socket', default="",
+                        help="With --serve, listen on a Unix socket at this path instead of stdin and stdout")
+    parser.add_argument('--profile', dest='profile', default="", action='store_const', const='table',
+                        help="Once done, write a table of statistics on what converting took to stderr. "
+                             "Files are converted in a single process so every conversion is counted")
+    parser.add_argument('--profile-json', dest='profile', action='store_const', const='json',
+                        help="As --profile, but writing the statistics as JSON")
     parser.add_argument('-v', '--version', dest='version', action='version',
                         version="Jiphy v.{0}".format(__version__))
     
     arguments = dict((key, value) for (key, value) in itemsview(vars(parser.parse_args())))
 
     file_names = arguments.pop('files', [])
-    if file_names == ['-']:
-        input_code = sys.stdin.read()
+    if arguments['jobs'] < 0:
+        parser.error("--jobs can not be negative")
+    if arguments['profile']:
+        from . import stats
+
+        stats.enable()
+        arguments['jobs'] = 1
+        try:
+            run(arguments, file_names, parser)
+        finally:
+            if arguments['profile'] == 'json':
+                sys.stderr.write(json.dumps(stats.collected().summary(), indent=1, sort_keys=True) + "\n")
+            else:
+                sys.stderr.write(stats.collected().table())
+        return
+
+    run(arguments, file_names, parser)
+
+
+def run(arguments, file_names, parser):
+    if arguments['serve']:
+        from .server import Server
+
+        server = Server()
+        if arguments['socket']:
+            server.serve_socket(arguments['socket'])
+        else:
+            server.serve(sys.stdin, sys.stdout)
+        return
+    elif not file_names:
+        parser.error("one or more files to convert are required, unless running with --serve")
+    elif file_names == ['-']:
+        if arguments['watch']:
+            parser.error("--watch can only be used when converting files")
+        if arguments['out_lang'] == "both":
+            parser.error("both output languages can only be produced when converting files")
+        lines = iter(sys.stdin.readline, '')
         if arguments['out_lang'] == "py":
-            sys.stdout.write(jiphy.to.python(input_code))
+            output_code = jiphy.to.python_lines(lines)
         else:
-            sys.stdout.write(jiphy.to.javascript(input_code))
+            output_code = jiphy.to.javascript_lines(lines)
+        for segment in output_code:
+            sys.stdout.write(segment)
+            sys.stdout.flush()
     else:
         if not arguments['diff']:
             print(INTRO)
         wrong_sorted_files = False
+        paths = file_names
         if arguments.get('recursive', False):
             file_names = iter_source_code(file_names, arguments['in_ext'])
+        manifest = None
+        if arguments['cache_dir'] and not arguments['diff']:
+            from .manifest import Manifest
+
+            manifest = Manifest(arguments['cache_dir'], options=[arguments[option] for option in CONVERSION_OPTIONS])
+        file_names = list(file_names)
+        skipped = set(file_name for file_name in file_names if manifest and manifest.unchanged(file_name))
+        converted = convert_files([file_name for file_name in file_names if file_name not in skipped], arguments,
+                                  arguments['jobs'])
         for file_name in file_names:
-            with open(file_name) as input_file:
-                input_code = input_file.read()
-                out_lang = arguments['out_lang']
-                if not out_lang:
-                    out_lang = file_name.split(".")[-1].lower()
-                    if out_lang in ("py", "js"):
-                        if not arguments['conform']:
-                            if out_lang == "py":
-                                out_lang = "js"
-                            else:
-                                out_lang = "py"
-                    else:
-                        out_lang = "js"
+            if file_name in skipped:
+                print("   |-> [SKIP]: '{0}' is unchanged since it was last converted".format(file_name))
+                continue
+
+            (output_file_names, log) = next(converted)
+            sys.stdout.write(log)
+            if manifest:
+                manifest.record(file_name, output_file_names)
+        if manifest:
+            manifest.save()
 
-                if out_lang == 'py':
-                    output_code = jiphy.to.python(input_code)
-                else:
-                    output_code = jiphy.to.javascript(input_code)
-
-                stripped_code = []
-                for line in output_code.split("\n"):
-                    stripped_code.append(line.rstrip())
-                output_code = '\n'.join(stripped_code)
-
-                file_name_parts = file_name.split('.')
-                output_file_name = "{0}{1}.{2}".format(arguments['out_dir'],
-                                                       ".".join(file_name_parts[:-1]), arguments['out_ext'] or out_lang)
-                if arguments['diff']:
-                    for line in unified_diff(input_code.splitlines(1),
-                                             output_code.splitlines(1),
-                                             fromfile=file_name + ':before',
-                                             tofile=output_file_name + ':after',
-                                             fromfiledate=datetime.fromtimestamp(os.path.getmtime(file_name)),
-                                             tofiledate=datetime.now()):
-                        sys.stdout.write(line)
-                else:
-                    print("   |-> [{2}]: {3} '{0}' -> '{1}' in a Jiphy!".format(file_name, output_file_name,
-                          out_lang.upper(), arguments['conform'] and "Conforming" or "Converting"))
-                    with open(output_file_name, 'w') as output_file:
-                        output_file.write(output_code.rstrip("\n") + "\n")
+        if arguments['watch']:
+            print("   |-> [WATCH]: Watching for changes, press Ctrl+C to stop")
+            sys.stdout.flush()
+            try:
+                for (file_name, output_file_names, log, seconds) in watch_files(paths, arguments,
+                                                                                file_stats(file_names), manifest):
+                    sys.stdout.write(log)
+                    if output_file_names is not None:
+                        print("   |-> [WATCH]: '{0}' converted in {1:.1f}ms".format(file_name, seconds * 1000))
+                    sys.stdout.flush()
+            except KeyboardInterrupt:
+                pass
 
         if not arguments['diff']:
             print("   |")
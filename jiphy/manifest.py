@@ -0,0 +1,104 @@
+"""jiphy/manifest.py
+
+Defines a manifest of converted files, letting the command line tool skip files unchanged since they were converted
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from . import __version__
+from .pie_slice import *
+
+
+def file_hash(file_name):
+    """Returns a hash of the given file's content"""
+    content_hash = hashlib.sha1()
+    with open(file_name, 'rb') as content:
+        for block in iter(lambda: content.read(65536), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+class Manifest(object):
+    """Records, for every file converted, its size, modification time and content hash alongside the files it was
+       converted into, the options used and the version of jiphy used.
+
+       A file is unchanged when all of those still match. Its size and modification time are enough to tell without
+       reading it, unless it was modified too close to when it was recorded for the modification time to be trusted.
+       When only the modification time differs (the file was touched but not changed) its content hash decides.
+    """
+    FILE_NAME = "manifest.json"
+
+    def __init__(self, directory, options=()):
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILE_NAME)
+        self.options = list(options)
+        self.files = {}
+        try:
+            with io.open(self.path, encoding='utf8') as manifest_file:
+                self.files = json.load(manifest_file).get('files', {})
+        except (IOError, OSError, ValueError):
+            pass
+
+    def unchanged(self, file_name):
+        """Returns True if the given file, and what it was converted into, are unchanged since it was recorded"""
+        entry = self.files.get(os.path.abspath(file_name), None)
+        if not entry or entry['version'] != __version__ or entry['options'] != self.options:
+            return False
+        if not all(os.path.exists(output_file_name) for output_file_name in entry['outputs']):
+            return False
+
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime == entry['mtime'] and stat.st_mtime < entry['recorded'] - 2:
+            return True
+
+        if file_hash(file_name) != entry['hash']:
+            return False
+        entry['mtime'] = stat.st_mtime
+        entry['recorded'] = time.time()
+        return True
+
+    def record(self, file_name, output_file_names):
+        """Records the given file as just having been converted into the given output files"""
+        stat = os.stat(file_name)
+        self.files[os.path.abspath(file_name)] = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                                                  'hash': file_hash(file_name), 'outputs': list(output_file_names),
+                                                  'options': self.options, 'version': __version__,
+                                                  'recorded': time.time()}
+
+    def save(self):
+        """Writes the manifest out, replacing the last one in a single step"""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        (handle, temporary_path) = tempfile.mkstemp(dir=self.directory)
+        with io.open(handle, 'w', encoding='utf8') as manifest_file:
+            manifest_file.write(str(json.dumps({'version': __version__, 'files': self.files}, indent=1,
+                                               sort_keys=True)))
+        getattr(os, 'replace', os.rename)(temporary_path, self.path)
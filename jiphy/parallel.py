@@ -0,0 +1,132 @@
+"""jiphy/parallel.py
+
+Defines how a single large piece of code is converted using several processes at once
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from . import to
+from .pie_slice import *
+from .segments import boundaries, completes_decorators, cuts, is_closed
+
+CHUNK_SIZE = 256 * 1024
+
+
+def render(children, language):
+    """Returns the output of the given top level handlers, as a (JavaScript, Python) pair when language is 'both'"""
+    if language != 'both':
+        return "".join(to.render(child, language) for child in children)
+
+    return ("".join(to.render(child, 'javascript') for child in children),
+            "".join(to.render(child, 'python') for child in children))
+
+
+def convert_chunk(job):
+    """Converts a (code, offset, language) job, offset being where the code starts within the whole of the code.
+
+       Returns the offsets, within the whole of the code, where the chunk could be cut were it to start where a new
+       segment could begin, the output between each of those cuts and the next, and whether the chunk ends with
+       anything left open.
+    """
+    (code, offset, language) = job
+    tree = to.ast(code)
+    found = [(0, 0)] + cuts(code, tree) + [(len(code), len(tree.children))]
+    pieces = [render(tree.children[start:end], language) for ((cut, start), (next_cut, end)) in zip(found, found[1:])]
+    return ([offset + cut for (cut, index) in found[:-1]], pieces, is_closed(tree))
+
+
+def chunks(code, chunk_size=CHUNK_SIZE):
+    """Returns the (start, end) spans of chunks, of at least chunk_size where possible, code can be cut into.
+
+       Chunks are only cut where a new segment could begin (see jiphy.segments), but as finding out if the code before
+       leaves anything open requires parsing it, that is left to whoever converts each chunk.
+    """
+    spans = []
+    start = 0
+    for boundary in boundaries(code):
+        if boundary - start >= chunk_size and completes_decorators(code, start, boundary):
+            spans.append((start, boundary))
+            start = boundary
+    spans.append((start, len(code)))
+    return spans
+
+
+def convert(code, language='javascript', jobs=0, chunk_size=CHUNK_SIZE):
+    """Converts code into the given language ('javascript', 'python' or 'both') cutting it into chunks converted by up
+       to jobs processes at once (0 uses one process per CPU), giving exactly the output converting it whole does.
+
+       Each chunk is converted as if it began a new segment. Where the chunk before turns out to leave something open
+       that isn't so: the code from the last place the chunk before could be cut up to the first place this chunk
+       can be is converted again, after which nothing is left open in either and the rest of the chunk is used as is.
+    """
+    import multiprocessing
+
+    spans = chunks(code, chunk_size)
+    jobs = min(jobs or multiprocessing.cpu_count(), len(spans))
+    if jobs < 2:
+        return render(to.ast(code).children, language)
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        results = pool.map(convert_chunk, [(code[start:end], start, language) for (start, end) in spans])
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    outputs = []
+    position = 0
+    for ((cuts, pieces, closed), (start, end)) in zip(results, spans):
+        if position not in cuts:
+            for cut in cuts[1:] + [end]:
+                if cut > position and completes_decorators(code, position, cut):
+                    tree = to.ast(code[position:cut])
+                    if is_closed(tree):
+                        outputs.append(render(tree.children, language))
+                        position = cut
+                        break
+            if position not in cuts:
+                continue
+
+        index = cuts.index(position)
+        if closed or end == len(code):
+            outputs.extend(pieces[index:])
+            position = end
+        else:
+            outputs.extend(pieces[index:-1])
+            position = cuts[-1]
+
+    if position < len(code):
+        outputs.append(render(to.ast(code[position:]).children, language))
+    if language == 'both':
+        return ("".join(javascript_code for (javascript_code, python_code) in outputs),
+                "".join(python_code for (javascript_code, python_code) in outputs))
+    return "".join(outputs)
+
+
+def javascript(code, jobs=0, chunk_size=CHUNK_SIZE):
+    """Takes the given Python or JavaScript code and returns back JavaScript code, converted using several processes"""
+    return convert(code, 'javascript', jobs, chunk_size)
+
+
+def python(code, jobs=0, chunk_size=CHUNK_SIZE):
+    """Takes the given JavaScript or Python code and returns back Python code, converted using several processes"""
+    return convert(code, 'python', jobs, chunk_size)
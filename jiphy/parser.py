@@ -21,64 +21,285 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
 from .pie_slice import *
 
+WORD_BOUNDARIES = (" ", "\t", "\n", ")", "(")
+LINE_INDENT = re.compile("^[ \t]*", re.MULTILINE)
+WHITESPACE = re.compile("[ \t\n]+")
+
+
+class Matcher(object):
+    """Finds the next occurrence of any of a set of strings in a single forward pass.
+
+       Strings are tried in the order given, so when more than one matches at the same position the first one wins.
+       Strings starting with '^' only match when preceded by one of the WORD_BOUNDARIES characters, which is
+       considered part of the match.
+    """
+    __slots__ = ('strings', 'pattern', 'longest', 'buckets')
+    compiled = {}
+
+    def __init__(self, strings):
+        self.strings = tuple(strings)
+        self.longest = max([len(string) for string in self.strings] or [0])
+
+        # Only strings sharing a first character can match at the same position, so they are grouped by it, keeping
+        # their given order. The pattern only finds where the first match is, without a group per string (older
+        # Pythons allow at most 100), and the string matched is then picked out of the bucket for that character
+        self.buckets = OrderedDict()
+        for route, string in enumerate(self.strings):
+            if string.startswith("^"):
+                for character in WORD_BOUNDARIES:
+                    self.buckets.setdefault(character, []).append((route, string[1:]))
+            if string:
+                self.buckets.setdefault(string[0], []).append((route, string[1:]))
+
+        branches = []
+        for character, rests in itemsview(self.buckets):
+            alternatives = "|".join(re.escape(rest) for (route, rest) in rests)
+            branches.append("{0}(?:{1})".format(re.escape(character), alternatives))
+        self.pattern = re.compile("|".join(branches) or "(?!)")
+
+    @classmethod
+    def compile(cls, strings):
+        """Returns the matcher for the given strings, building it only the first time they are seen"""
+        matcher = cls.compiled.get(strings, None)
+        if matcher is None:
+            matcher = cls.compiled[strings] = cls(strings)
+        return matcher
+
+    def find(self, code, index=0, end=None):
+        """Returns the position and route id (the index of the matched string) of the first match at or after index
+           and before end, or (len(code), -1) if there is none"""
+        end = len(code) if end is None else end
+        match = self.pattern.search(code, index, end)
+        if not match:
+            return (len(code), -1)
+
+        start = match.start()
+        for (route, rest) in self.buckets[code[start]]:
+            if code.startswith(rest, start + 1, end):
+                return (start, route)
+
+    def search(self, code, index=0):
+        """Returns the position and string of the first match at or after index, or (len(code), '') if none"""
+        (position, route) = self.find(code, index)
+        return (position, route >= 0 and self.strings[route] or '')
+
+
+class TokenStream(object):
+    """The tokens found so far for a single stop-set, stored as parallel arrays ordered by start offset.
+
+       Alongside each token the earliest offset a search has started from and still landed on it is kept, so any
+       later search starting between the two can be answered without looking at the code again.
+    """
+    __slots__ = ('matcher', 'starts', 'routes', 'known_from', 'exhausted_from')
+
+    def __init__(self, matcher, length):
+        self.matcher = matcher
+        self.starts = array('I')
+        self.routes = array('H')
+        self.known_from = array('I')
+        self.exhausted_from = length
+
+    def reset(self, length):
+        """Forgets every token found, ready to find them within new code of the given length"""
+        del self.starts[:]
+        del self.routes[:]
+        del self.known_from[:]
+        self.exhausted_from = length
+
+    def next(self, code, index):
+        """Returns the (route id, start) of the first token at or after index, or (-1, len(code)) if there is none"""
+        position = bisect_left(self.starts, index)
+        if position < len(self.starts):
+            if self.known_from[position] <= index:
+                return (self.routes[position], self.starts[position])
+            scanned_till = self.known_from[position]
+        elif index >= self.exhausted_from:
+            return (-1, len(code))
+        else:
+            scanned_till = self.exhausted_from
+
+        # Only code not already scanned needs to be searched, plus enough overlap to complete a match starting in it
+        (start, route) = self.matcher.find(code, index, min(len(code), scanned_till - 1 + self.matcher.longest))
+        if route == -1 or start >= scanned_till:
+            if position < len(self.starts):
+                self.known_from[position] = index
+                return (self.routes[position], self.starts[position])
+            self.exhausted_from = index
+            return (-1, len(code))
+
+        self.starts.insert(position, start)
+        self.routes.insert(position, route)
+        self.known_from.insert(position, index)
+        return (route, start)
+
+
+class Lexer(object):
+    """Tokenizes code against the stop-sets handlers ask for, examining each character at most once per stop-set.
+
+       The tokens found are kept, so rewinding the parser or looking ahead reuses them rather than scanning again,
+       and a lexer can be shared by every parser working on the same code.
+    """
+    __slots__ = ('code', 'streams')
+
+    def __init__(self, code):
+        self.code = code
+        self.streams = {}
+
+    def reset(self, code):
+        """Starts over on new code, keeping the stream (and so the compiled matcher) of every stop-set seen"""
+        self.code = code
+        for stream in valuesview(self.streams):
+            stream.reset(len(code))
+
+    def token(self, strings, index=0):
+        """Returns the (route id, start, end) of the first token for the given stop-set at or after index.
+           The route id is the position of the matched string within strings, or -1 if nothing matches"""
+        stream = self.streams.get(strings, None)
+        if stream is None:
+            stream = self.streams[strings] = TokenStream(Matcher.compile(strings), len(self.code))
+        (route, start) = stream.next(self.code, index)
+        return (route, start, route >= 0 and start + len(strings[route]) or start)
+
+    def tokens(self, strings, index=0):
+        """Iterates over every consecutive token for the given stop-set, starting from index"""
+        while True:
+            token = self.token(strings, index)
+            if token[0] < 0:
+                break
+            yield token
+            index = token[2]
+
 
 class Parser(object):
     """Defines the direct interaction between jiphy and the file content"""
 
-    def __init__(self, code):
+    def __init__(self, code, lexer=None):
         self.index = 0
         self.code = code
         self.output = []
+        self.lexer = lexer or Lexer(code)
+        self._line_starts = None
+        self._indents = None
+        self._next_content = None
+        self._prev_content = None
+        self._words = {}
+
+    def reset(self, code):
+        """Starts over on new code, reusing the lexer (and all it has set up) rather than building another"""
+        self.__init__(code, self.lexer)
+        self.lexer.reset(code)
+
+    def span_till(self, strings):
+        """Moves past the first occurrence of the given string (or one of the given strings), returning the
+           (start, end) offsets of the text skipped over alongside the string that was matched"""
+        if isinstance(strings, str):
+            strings = (strings, )
+
+        strings = tuple(strings)
+        start = self.index
+        (route, end, _) = self.lexer.token(strings, start)
+        if route < 0:
+            end = max(len(self), start)
+        self.index = end + 1
+        return (start, end, route >= 0 and strings[route] or '')
 
     def text_till(self, strings, keep_index=False):
         """Returns all text till it encounters the given string (or one of the given strings)"""
-        if isinstance(strings, str):
-            strings = [strings]
-
         original_index = self.index
-
-        text = ""
-        matched_string = ""
-
-        while self.more:
-            test_against = self.characters(len(max(strings, key=len)))
-            for string in strings:
-                if string.startswith("^"):
-                    if test_against[0] in (" ", "\t", "\n", ")", "(") and test_against[1:].startswith(string[1:]):
-                        matched_string = string
-                        break
-                if test_against.startswith(string):
-                    matched_string = string
-                    break
-
-            if matched_string:
-                break
-
-            text += self.pop()
-
-        self += 1
-
+        (start, end, matched_string) = self.span_till(strings)
         if keep_index:
             self.index = original_index
 
-        return (text, matched_string)
+        return (self.code[start:end], matched_string)
+
+    def word_before(self, strings):
+        """Returns the last word of the text till the given string (or one of the given strings), without moving.
+
+           The word found before each match is remembered along with how far back was looked for it, so asking again
+           from further along never looks at the same code twice.
+        """
+        if isinstance(strings, str):
+            strings = (strings, )
+
+        strings = tuple(strings)
+        start = self.index
+        (route, end, _) = self.lexer.token(strings, start)
+        if route < 0:
+            end = max(len(self), start)
+
+        (looked_from, word_start, word_end) = self._words.get((strings, end), (end + 1, end, end))
+        if start < looked_from:
+            code = self.code
+            word_end = end
+            while word_end > start and code[word_end - 1].isspace():
+                word_end -= 1
+            word_start = word_end
+            while word_start > start and not code[word_start - 1].isspace():
+                word_start -= 1
+            self._words[(strings, end)] = (start, word_start, word_end)
+
+        return self.code[max(word_start, start):word_end] if start < word_end else ""
 
     def __getitem__(self, index):
         return self.code[index]
 
     def text_after(self, start, match_on):
         """Returns all text till it encounters the given string (or one of the given strings)"""
-        text = ""
-        index = start - 1
-        while index > 0:
-            text = self.code[index:start]
-            if text.startswith(match_on):
-                return text.lstrip(match_on)
-            index -= 1
+        if match_on == "\n":  # the start of every line is already known
+            line_start = self.line_starts[self.line_number(start)] if start > 1 else 0
+            if line_start > 1:
+                return self.code[line_start:start]
+
+        index = start > 1 and self.code.rfind(match_on, 1, start) or -1
+        if index == -1:
+            index = 1
+
+        return self.code[index:start].lstrip(match_on)
+
+    def _index_lines(self):
+        """Records where every line starts and how wide its leading indentation is, in a single pass"""
+        self._line_starts = array('I')
+        self._indents = array('I')
+        for match in LINE_INDENT.finditer(self.code):
+            self._line_starts.append(match.start())
+            self._indents.append(match.end() - match.start())
 
-        return text.lstrip(match_on)
+    @property
+    def line_starts(self):
+        """The offset each line of code starts at"""
+        if self._line_starts is None:
+            self._index_lines()
+        return self._line_starts
+
+    @property
+    def indents(self):
+        """The width of the leading indentation of each line of code"""
+        if self._indents is None:
+            self._index_lines()
+        return self._indents
+
+    def line_number(self, index):
+        """Returns the (zero based) line the given index falls on"""
+        return max(bisect_right(self.line_starts, index) - 1, 0)
+
+    def column(self, index):
+        """Returns the (zero based) column the given index falls on"""
+        return index - self.line_starts[self.line_number(index)]
+
+    def indentation(self, index):
+        """Returns the leading whitespace of the line the given index falls on, up to that index"""
+        if index <= 0:
+            return ""
+
+        line = self.line_number(index)
+        line_start = self.line_starts[line]
+        return self.code[line_start:min(line_start + self.indents[line], index)]
 
     def pop(self):
         """removes the current character then moves to the next one, returning the current character"""
@@ -114,17 +335,33 @@ class Parser(object):
         """Returns the specified number of characters in front of 'start'"""
         return self.code[start: start + difference]
 
+    def _index_content(self, backwards=False):
+        """Builds a table holding, for every index, where the nearest non-whitespace character is found when
+           moving forwards (or backwards) from it. Whitespace runs are filled a slice at a time"""
+        table = array('I', range(len(self.code) + (0 if backwards else 1)))
+        for match in WHITESPACE.finditer(self.code):
+            (start, end) = match.span()
+            table[start:end] = array('I', [max(start - 1, 0) if backwards else end]) * (end - start)
+        return table
+
     def next_content(self, start, amount=1):
         """Returns the next non-whitespace characters"""
-        while start < len(self.code) and self.code[start] in (' ', '\t', '\n'):
-            start += 1
+        if self._next_content is None:
+            self._next_content = self._index_content()
+        if 0 <= start < len(self._next_content):
+            start = self._next_content[start]
+        else:
+            while start < len(self.code) and self.code[start] in (' ', '\t', '\n'):
+                start += 1
 
         return self.code[start: start + amount]
 
     def prev_content(self, start, amount=1):
         """Returns the prev non-whitespace characters"""
-        while start > 0 and self.code[start] in (' ', '\t', '\n'):
-            start -= 1
+        if start > 0:
+            if self._prev_content is None:
+                self._prev_content = self._index_content(backwards=True)
+            start = self._prev_content[start]
 
         return self.code[(start or amount) - amount: start]
 
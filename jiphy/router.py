@@ -21,46 +21,143 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from copy import deepcopy
-
 from .pie_slice import *
 
 
 class Router(object):
     """Routes specific text patterns to handlers that define how the content will be transformed
-       creating a pseudo AST"""
-    __slots__ = ('routes', )
+       creating a pseudo AST.
+
+       A router created by excluding() is a view onto the router it came from, so it stays cheap to make and always
+       reflects the routes added to its base. Every route added to any router is counted in Router.changes, so
+       anything compiled from routers can tell when it needs compiling again.
+    """
+    __slots__ = ('_routes', 'base', 'excluded', '_match_on')
+    changes = 0
 
     def __init__(self, *routes):
-        self.routes = OrderedDict()
+        self._routes = OrderedDict()
+        self.base = None
+        self.excluded = ()
+        self._match_on = None
         for route in routes:
             self.add(*route[1:])(route[0])
 
     def add(self, *match):
+        if self.base is not None:
+            raise TypeError("Routes can not be added to a router created by excluding()")
+
         def decorator(handler):
             if isinstance(handler.start_on, str):
                 handler.start_on = (handler.start_on, )
             if isinstance(handler.end_on, str):
                 handler.end_on = (handler.end_on, )
             for match_on in (match + handler.start_on):
-                self.routes[match_on] = handler
+                self._routes[match_on] = handler
+            self._match_on = None
+            Router.changes += 1
             return handler
         return decorator
 
     @property
-    def match_on(self):
-        return tuple(self.routes.keys())
+    def routes(self):
+        if self.base is None:
+            return self._routes
+        return OrderedDict((match_on, handler) for (match_on, handler) in itemsview(self.base.routes)
+                           if match_on not in self.excluded)
 
+    @property
+    def match_on(self):
+        if self.base is not None:
+            return tuple(self.routes.keys())
+        if self._match_on is None:
+            self._match_on = tuple(self._routes.keys())
+        return self._match_on
 
     def __getitem__(self, item):
-        return self.routes[item]
+        if item in self.excluded:
+            raise KeyError(item)
+        return self.base[item] if self.base is not None else self._routes[item]
 
-    def get(self, *args):
-        return self.routes.get(*args)
+    def get(self, item, default=None):
+        try:
+            return self[item]
+        except KeyError:
+            return default
 
     def excluding(self, *routes):
-        new_router = deepcopy(self)
-        for route in routes:
-            del new_router.routes[route]
-
+        new_router = Router()
+        new_router.base = self
+        new_router.excluded = frozenset(routes)
         return new_router
+
+
+class CompiledRoutes(object):
+    """Everything needed to parse the content of a single handler class: the strings to stop on, the strings that end
+       the handler and the handlers each matched string dispatches to"""
+    __slots__ = ('stop_on', 'end_on', 'dispatch')
+
+    def __init__(self, stop_on, end_on, dispatch):
+        self.stop_on = stop_on
+        self.end_on = end_on
+        self.dispatch = dispatch
+
+
+class RouteTable(object):
+    """Compiles the routes of each handler class the first time it is parsed, reusing the result from then on.
+
+       When replaces is given every handler that accepts that router as its children, or a router excluding routes
+       from it, is given routes (or routes excluding the same) instead, allowing a custom set of routes to be used
+       throughout a conversion without touching the handler classes.
+
+       Everything compiled is forgotten once a route is added to any router, the next time refresh() is called (as it
+       is before every parse) or a handler's routes are looked up here.
+    """
+    __slots__ = ('routes', 'replaces', 'compiled', 'resolved', 'changes')
+
+    def __init__(self, routes=None, replaces=None):
+        self.routes = routes
+        self.replaces = replaces
+        self.compiled = {}
+        self.resolved = {}
+        self.changes = Router.changes
+
+    def refresh(self):
+        """Forgets every compiled route if a route has been added to any router since they were compiled"""
+        if self.changes != Router.changes:
+            self.compiled.clear()
+            self.resolved.clear()
+            self.changes = Router.changes
+
+    def __getitem__(self, handler):
+        self.refresh()
+        compiled = self.compiled.get(handler, None)
+        if compiled is None:
+            compiled = self.compiled[handler] = self.compile(handler)
+        return compiled
+
+    def resolve(self, router):
+        """Returns the routes, as an ordered mapping, that stand in for the given router"""
+        resolved = self.resolved.get(router, None)
+        if resolved is None:
+            if self.replaces is not None and router is self.replaces:
+                resolved = self.routes.routes
+            elif router.base is not None:
+                resolved = OrderedDict((match_on, handler) for (match_on, handler) in
+                                       itemsview(self.resolve(router.base)) if match_on not in router.excluded)
+            else:
+                resolved = router.routes
+            self.resolved[router] = resolved
+        return resolved
+
+    def compile(self, handler):
+        end_on = handler.end_on
+        if isinstance(end_on, str):
+            end_on = (end_on, )
+        yield_for = handler.yield_for
+        if isinstance(yield_for, str):
+            yield_for = (yield_for, )
+
+        dispatch = self.resolve(handler.accept_children)
+        return CompiledRoutes(tuple(yield_for) + tuple(end_on) + tuple(dispatch.keys()), frozenset(end_on),
+                              dict(dispatch))
@@ -0,0 +1,134 @@
+"""jiphy/segments.py
+
+Defines how code is split into top level segments that can each be converted on their own
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import re
+
+from .handlers import Handler, PassThrough, routes
+from .parser import Parser
+from .pie_slice import *
+
+BLANK_LINE = re.compile("\n\n(?=[^ \t\n;.(])")
+WORD_BOUNDARY_ROUTES = tuple(match_on[1:] for match_on in routes.match_on if match_on.startswith("^"))
+LOOKAHEAD = max([len(route) for route in WORD_BOUNDARY_ROUTES] + [1])
+
+
+def boundaries(code, start=0, end=None):
+    """Yields every offset within code, after start and before end, where a new segment could begin.
+
+       Segments begin on the first line of code following a blank line. Handlers may look at the character following
+       them (to see if a statement continues with '.', '(' or ';') or at the one before them (for routes starting
+       with '^'), so offsets where either would see something other than the start of a new statement are skipped.
+    """
+    for match in BLANK_LINE.finditer(code, start, len(code) if end is None else end):
+        offset = match.end()
+        if not code.startswith(WORD_BOUNDARY_ROUTES, offset):
+            yield offset
+
+
+def is_boundary(code, offset):
+    """Returns True if a new segment could begin at the given offset within code"""
+    return (offset >= 2 and BLANK_LINE.match(code, offset - 2) is not None and
+            not code.startswith(WORD_BOUNDARY_ROUTES, offset))
+
+
+def is_closed(tree):
+    """Returns True if every handler within the given tree ended by finding what it ends on, rather than by
+       running out of code"""
+    handlers = list(tree.children)
+    while handlers:
+        handler = handlers.pop()
+        if isinstance(handler, Handler):
+            if handler.end_on and not handler.ended_on:
+                return False
+            handlers.extend(handler.children)
+    return True
+
+
+def completes_decorators(code, start, end):
+    """Returns True unless code[start:end] holds a decorator that would look beyond end for the '(' following it"""
+    decorator = code.rfind("@", start, end)
+    return decorator == -1 or code.find("(", decorator, end) != -1
+
+
+def stands_alone(code, start, end, closed):
+    """Returns True if code[start:end] converts the same on its own as it does as part of code"""
+    return completes_decorators(code, start, end) and closed(code[start:end])
+
+
+def split(code, closed=None, start=0, end=None):
+    """Returns the (start, end) spans code, between start and end, can be split into so that converting each span on
+       its own and joining the results together gives exactly the same output as converting all of it at once.
+
+       closed is called with the text of each possible segment, and should return whether parsing it leaves nothing
+       open (see is_closed). It defaults to parsing the text with the built-in routes. Once a possible segment turns
+       out to leave something open, the next isn't tried until it is twice as long, so code following something left
+       open is only parsed a handful of times rather than once for every blank line within it.
+    """
+    if closed is None:
+        closed = lambda text: is_closed(Handler(Parser(text)))
+    end = len(code) if end is None else end
+
+    spans = []
+    attempted = start
+    for boundary in boundaries(code, start, end):
+        if boundary - start < 2 * (attempted - start):
+            continue
+        if stands_alone(code, start, boundary, closed):
+            spans.append((start, boundary))
+            start = attempted = boundary
+        else:
+            attempted = boundary
+    if start < end or not spans:
+        spans.append((start, end))
+    return spans
+
+
+def last_boundary(code, start=0):
+    """Returns the last offset within code, after start, where a new segment could begin whatever follows code, or
+       None if there isn't one"""
+    last = None
+    for boundary in boundaries(code, start):
+        following = code[boundary:boundary + LOOKAHEAD]
+        if len(following) < LOOKAHEAD and any(route.startswith(following) for route in WORD_BOUNDARY_ROUTES):
+            break  # a route starting at the boundary may still follow
+        last = boundary
+    return last
+
+
+def cuts(code, tree):
+    """Returns an (offset, index) pair for every top level handler within tree, the result of parsing code, that begins
+       a new segment: the offset it starts at within code alongside its index within the tree's children.
+
+       Unlike split, code is only parsed once, which holds as long as code itself begins a new segment. The code
+       before each of these offsets converts on its own exactly as it does within code, even when code as a whole
+       leaves something open.
+    """
+    candidates = set(boundaries(code))
+    found = []
+    previous = 0
+    for (index, child) in enumerate(tree.children):
+        start = child.start if isinstance(child, PassThrough) else child.start_index
+        if start in candidates and completes_decorators(code, previous, start):
+            found.append((start, index))
+            previous = start
+    return found
@@ -0,0 +1,199 @@
+"""jiphy/server.py
+
+Defines a long running conversion server for editor integrations, answering line delimited JSON requests over
+stdio or a local Unix socket
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import errno
+import json
+import os
+import signal
+import socket
+import stat
+
+from .pie_slice import *
+from .to import Converter
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+METHODS = ('javascript', 'python', 'both')
+
+
+def line_range(code, start, end):
+    """Returns the given [start, end) range of code widened to cover whole lines"""
+    start = code.rfind("\n", 0, max(start, 0)) + 1
+    if end <= start or code[end - 1:end] != "\n":
+        line_end = code.find("\n", max(end, start))
+        end = len(code) if line_end == -1 else line_end + 1
+    return (start, end)
+
+
+def margin(code):
+    """Returns the indentation shared by every line of code containing anything other than whitespace"""
+    indents = [line[:len(line) - len(line.lstrip())] for line in code.split("\n") if line.strip()]
+    return os.path.commonprefix(indents) if indents else ""
+
+
+def dedent(code, indent):
+    return "\n".join(line[len(indent):] if line.startswith(indent) else line for line in code.split("\n"))
+
+
+def indent(code, indent):
+    return "\n".join(indent + line if line.strip() else line for line in code.split("\n"))
+
+
+class Server(object):
+    """Answers conversion requests using a single converter, kept warm between them.
+
+       Every request is a JSON object on a line of its own, with the method to use ("javascript", "python" or
+       "both"), the code to convert and optionally an id to pass back alongside the response. When a range of
+       [start, end) offsets is given only that part of the code, widened to whole lines, is converted and the widened
+       range is returned so it can be replaced. Every response is a JSON object on a line of its own, holding the
+       converted code by language or an error.
+    """
+
+    def __init__(self, converter=None):
+        self.converter = converter or Converter()
+        self.converter.warm_up()
+
+    def respond(self, request):
+        """Returns the response to a single decoded request"""
+        response = {}
+        if 'id' in request:
+            response['id'] = request['id']
+
+        method = request.get('method', 'javascript')
+        code = request.get('code', '')
+        if method not in METHODS:
+            response['error'] = "Unknown method {0!r}, expected one of: {1}".format(method, ", ".join(METHODS))
+            return response
+        if not isinstance(code, str):
+            response['error'] = "code must be a string"
+            return response
+
+        shared_indent = ""
+        if request.get('range', None) is not None:
+            (start, end) = line_range(code, *request['range'])
+            response['range'] = [start, end]
+            code = code[start:end]
+            shared_indent = margin(code)
+            code = dedent(code, shared_indent)
+
+        if method == 'both':
+            (response['javascript'], response['python']) = self.converter.both(code)
+        else:
+            response[method] = getattr(self.converter, method)(code)
+
+        if shared_indent:
+            for language in ('javascript', 'python'):
+                if language in response:
+                    response[language] = indent(response[language], shared_indent)
+        return response
+
+    def handle(self, line):
+        """Returns the JSON encoded response to a single JSON encoded request"""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, native_dict):
+                raise ValueError("requests must be JSON objects")
+        except ValueError as error:
+            return json.dumps({'error': "Invalid request: {0}".format(error)})
+
+        try:
+            response = self.respond(request)
+        except Exception as error:
+            response = {'error': "{0}: {1}".format(type(error).__name__, error)}
+            if 'id' in request:
+                response['id'] = request['id']
+        return json.dumps(response)
+
+    def serve(self, requests, responses):
+        """Answers every request read, a line at a time, from the requests file writing each response as a line to
+           the responses file as soon as it is ready"""
+        for line in iter(requests.readline, ''):
+            if line.strip():
+                responses.write(self.handle(line) + "\n")
+                responses.flush()
+
+    def serve_socket(self, path):
+        """Answers requests from any number of clients connecting, at the same time, to a Unix socket at path.
+
+           A socket left at path by a server that is no longer running is removed before listening, and the socket is
+           removed once serving stops, including when the server is terminated.
+        """
+        remove_stale_socket(path)
+        server = UnixServer(path, SocketHandler)
+        server.jiphy = self
+        try:
+            terminate = signal.signal(signal.SIGTERM, stop_serving)
+        except ValueError:  # signal handlers can only be set from the main thread
+            terminate = None
+        try:
+            server.serve_forever()
+        finally:
+            if terminate is not None:
+                signal.signal(signal.SIGTERM, terminate)
+            server.server_close()
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def stop_serving(signal_number, frame):
+    raise SystemExit(128 + signal_number)
+
+
+def remove_stale_socket(path):
+    """Removes the socket at path if nothing is listening on it, raising an error if a server still is"""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except OSError:
+        return
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except socket.error as error:
+        if error.errno != errno.ECONNREFUSED:
+            raise
+        os.remove(path)
+        return
+    finally:
+        client.close()
+    raise socket.error(errno.EADDRINUSE, "A server is already listening on {0}".format(path))
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SocketHandler(socketserver.StreamRequestHandler):
+    """Serves a single client connected to a UnixServer"""
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            if line.strip():
+                response = self.server.jiphy.handle(line.decode('utf8'))
+                self.wfile.write((response + "\n").encode('utf8'))
+                self.wfile.flush()
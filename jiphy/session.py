@@ -0,0 +1,136 @@
+"""jiphy/session.py
+
+Defines a conversion session, keeping code converted as it is edited by re-converting only what an edit touches
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from bisect import bisect_right
+
+from . import to
+from .pie_slice import *
+from .segments import is_boundary, is_closed, split, stands_alone
+
+
+def split_lines(text):
+    """Splits text into lines, each keeping the new line that ends it"""
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    return lines if lines[-1] else lines[:-1]
+
+
+class Session(object):
+    """Holds code alongside its conversion into the given language ('javascript' or 'python').
+
+       The code is split into top level segments (see jiphy.segments), each kept as its own parsed tree and output,
+       so an edit only re-parses and re-renders the segments it touches rather than all of the code.
+    """
+    __slots__ = ('converter', 'language', 'code', 'starts', 'trees', 'outputs', 'lines')
+
+    def __init__(self, code, language='javascript', converter=None):
+        self.converter = converter or to.converter
+        self.language = language
+        self.code = code
+        (self.starts, self.trees, self.outputs) = self.convert(0, len(code))
+        self.lines = [output.count("\n") for output in self.outputs]
+
+    @property
+    def output(self):
+        return "".join(self.outputs)
+
+    def convert(self, start, end):
+        """Splits code[start:end] into segments, returning the (starts, trees, outputs) of each"""
+        parsed = {}
+
+        def closed(text):
+            tree = parsed[text] = self.converter.ast(text)
+            return is_closed(tree)
+
+        starts = []
+        trees = []
+        outputs = []
+        for (segment_start, segment_end) in split(self.code, closed, start, end):
+            text = self.code[segment_start:segment_end]
+            tree = parsed.get(text, None) or self.converter.ast(text)
+            starts.append(segment_start)
+            trees.append(tree)
+            outputs.append(to.render(tree, self.language))
+        return (starts, trees, outputs)
+
+    def segment_end(self, segment):
+        return self.starts[segment + 1] if segment + 1 < len(self.starts) else len(self.code)
+
+    def edit(self, start, end, text):
+        """Replaces code[start:end] with text, returning what changed within the output as a
+           (first line changed, number of lines removed, lines added) tuple"""
+        first = max(bisect_right(self.starts, start) - 1, 0)
+        if first and self.starts[first] == start:  # the segment before may now run on into the edit
+            first -= 1
+        last = max(bisect_right(self.starts, end) - 1, first)
+        old_outputs = self.outputs[first:last + 1]
+        difference = len(text) - (end - start)
+        self.code = self.code[:start] + text + self.code[end:]
+        for segment in range(last + 1, len(self.starts)):
+            self.starts[segment] += difference
+
+        while True:
+            region_end = self.segment_end(last)
+            (starts, trees, outputs) = self.convert(self.starts[first], region_end)
+            if region_end == len(self.code) or (is_boundary(self.code, region_end) and
+                                                stands_alone(self.code, starts[-1], region_end,
+                                                             lambda text: is_closed(trees[-1]))):
+                break
+            last = min(2 * last - first + 1, len(self.starts) - 1)  # twice as many segments, so this ends quickly
+            old_outputs = self.outputs[first:last + 1]
+
+        self.starts[first:last + 1] = starts
+        self.trees[first:last + 1] = trees
+        self.outputs[first:last + 1] = outputs
+        self.lines[first:last + 1] = [output.count("\n") for output in outputs]
+        return self.changed_lines(first, len(outputs), old_outputs)
+
+    def changed_lines(self, first, count, old_outputs):
+        """Compares the output of count segments, starting from first, against what they output before"""
+        leading = []
+        segment = first - 1
+        while segment >= 0 and "\n" not in "".join(leading):
+            leading.insert(0, self.outputs[segment])
+            segment -= 1
+        leading = "".join(leading)
+        leading = leading[leading.rfind("\n") + 1:]
+
+        trailing = []
+        segment = first + count
+        while segment < len(self.outputs) and "\n" not in "".join(trailing):
+            trailing.append(self.outputs[segment])
+            segment += 1
+        trailing = "".join(trailing)
+        trailing = trailing[:trailing.find("\n") + 1] if "\n" in trailing else trailing
+
+        old_lines = split_lines(leading + "".join(old_outputs) + trailing)
+        new_lines = split_lines(leading + "".join(self.outputs[first:first + count]) + trailing)
+        line = sum(self.lines[:first])
+        while old_lines and new_lines and old_lines[0] == new_lines[0]:
+            old_lines.pop(0)
+            new_lines.pop(0)
+            line += 1
+        while old_lines and new_lines and old_lines[-1] == new_lines[-1]:
+            old_lines.pop()
+            new_lines.pop()
+        return (line, len(old_lines), new_lines)
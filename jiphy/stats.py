@@ -0,0 +1,141 @@
+"""jiphy/stats.py
+
+Defines opt-in statistics on where conversion time goes: how many nodes of each handler class are produced, how much
+code is scanned looking for each handler's routes, how often handlers back track and how long parsing and rendering
+take
+
+Copyright (C) 2015  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+
+from .handlers import Handler
+from .pie_slice import *
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def scanned(stream, length):
+    """Returns how many characters of code, length characters long, the given TokenStream has searched through"""
+    characters = sum(start - known_from for (start, known_from) in zip(stream.starts, stream.known_from))
+    return characters + max(length - stream.exhausted_from, 0)
+
+
+class Stats(object):
+    """Counters and timers collected for every conversion made while enabled.
+
+       Nothing is collected as code is parsed: node counts and characters scanned are read off the finished tree and
+       the tokens its parser kept, and only handlers that back track report doing so, so leaving statistics disabled
+       costs nothing.
+    """
+    __slots__ = ('conversions', 'characters', 'parse_seconds', 'render_seconds', 'nodes', 'scanned', 'back_tracks',
+                 'back_tracked')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.conversions = 0
+        self.characters = 0
+        self.parse_seconds = 0.0
+        self.render_seconds = 0.0
+        self.nodes = {}
+        self.scanned = {}
+        self.back_tracks = {}
+        self.back_tracked = {}
+
+    def parsed(self, tree, seconds, route_table, nodes=None):
+        """Records the tree produced by parsing code, using route_table, in the given number of seconds.
+           When the tree was added to a compact NodeTable, nodes gives the number made by each handler class"""
+        self.conversions += 1
+        self.characters += len(tree.parser.code)
+        self.parse_seconds += seconds
+
+        if nodes is None:
+            nodes = {}
+            handlers = [tree]
+            while handlers:
+                handler = handlers.pop()
+                name = type(handler).__name__
+                nodes[name] = nodes.get(name, 0) + 1
+                handlers.extend(handler.children)
+        for (name, count) in itemsview(nodes):
+            self.nodes[name] = self.nodes.get(name, 0) + count
+
+        owners = {}
+        for (handler, compiled) in itemsview(route_table.compiled):
+            owners.setdefault(compiled.stop_on, []).append(handler.__name__)
+        for (stop_on, stream) in itemsview(tree.parser.lexer.streams):
+            if stop_on in owners:
+                name = "/".join(sorted(owners[stop_on]))
+            else:  # searched for directly by a handler, rather than for its routes
+                name = "text_till {0}".format(" ".join(stop_on).replace("\n", "\\n"))
+            self.scanned[name] = self.scanned.get(name, 0) + scanned(stream, len(tree.parser.code))
+
+    def rendered(self, seconds):
+        self.render_seconds += seconds
+
+    def back_track(self, handler, amount):
+        """Records the given handler moving the parser back by amount characters once it ended"""
+        name = type(handler).__name__
+        self.back_tracks[name] = self.back_tracks.get(name, 0) + 1
+        self.back_tracked[name] = self.back_tracked.get(name, 0) + amount
+
+    def summary(self):
+        """Returns everything collected as a dictionary, ready to be dumped as JSON"""
+        handlers = {}
+        for name in set(self.nodes) | set(self.scanned) | set(self.back_tracks):
+            handlers[name] = {'nodes': self.nodes.get(name, 0), 'scanned': self.scanned.get(name, 0),
+                              'back_tracks': self.back_tracks.get(name, 0),
+                              'back_tracked': self.back_tracked.get(name, 0)}
+        return {'conversions': self.conversions, 'characters': self.characters,
+                'parse_seconds': self.parse_seconds, 'render_seconds': self.render_seconds, 'handlers': handlers}
+
+    def table(self):
+        """Returns everything collected as a table, handlers with the most code scanned for them first"""
+        summary = self.summary()
+        lines = ["{0} conversions of {1} characters: parsing took {2:.1f}ms, rendering {3:.1f}ms".format(
+                 summary['conversions'], summary['characters'], summary['parse_seconds'] * 1000,
+                 summary['render_seconds'] * 1000), "",
+                 "{0:40} {1:>9} {2:>12} {3:>12} {4:>12}".format("handler", "nodes", "scanned", "back tracks",
+                                                               "back tracked")]
+        for (name, handler) in sorted(itemsview(summary['handlers']), key=lambda item: (-item[1]['scanned'],
+                                                                                         -item[1]['nodes'], item[0])):
+            lines.append("{0:40} {1:9} {2:12} {3:12} {4:12}".format(name, handler['nodes'], handler['scanned'],
+                                                                  handler['back_tracks'], handler['back_tracked']))
+        return "\n".join(lines) + "\n"
+
+
+def enable():
+    """Starts collecting statistics for every conversion made, returning the Stats they are collected into"""
+    if Handler.stats is None:
+        Handler.stats = Stats()
+    return Handler.stats
+
+
+def disable():
+    """Stops collecting statistics, returning the Stats collected so far (or None if they weren't enabled)"""
+    stats = Handler.stats
+    Handler.stats = None
+    return stats
+
+
+def collected():
+    """Returns the Stats being collected, or None when statistics are disabled"""
+    return Handler.stats
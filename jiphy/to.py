@@ -21,21 +21,351 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from . import handlers
 from .handlers import Handler
-from .parser import Parser
+from .parser import Lexer, Matcher, Parser
 from .pie_slice import *
+from .router import Router, RouteTable
+from .segments import LOOKAHEAD, completes_decorators, cuts, is_closed, last_boundary, split
+from .stats import timer
 
 
-def ast(code):
-    """Takes the given Python or JavaScript code and returns back a rough Abstract Syntax Tree representation"""
-    return Handler(Parser(code))
+class StrippedOutput(object):
+    """Wraps a file-like output, removing trailing whitespace from every line as it is written.
 
+       Lines are passed through as soon as they are complete, except for trailing blank lines which are held back
+       until more content follows. Once closed, the output ends in exactly one new line when end_with_newline is set,
+       otherwise the held back blank lines are written out as they were.
+    """
+    __slots__ = ('output', 'end_with_newline', 'line', 'blank_lines')
 
-def javascript(code):
-    """Takes the given Python or JavaScript code and returns back JavaScript code"""
-    return ast(code).javascript
+    def __init__(self, output, end_with_newline=True):
+        self.output = output
+        self.end_with_newline = end_with_newline
+        self.line = []
+        self.blank_lines = 0
 
+    def write(self, text):
+        lines = text.split("\n")
+        if len(lines) == 1:
+            self.line.append(text)
+            return
 
-def python(code):
-    """Takes the given JavaScript or Python code and returns back Python code"""
-    return ast(code).python
+        self.line.append(lines[0])
+        self._write_line("".join(self.line))
+        for line in lines[1:-1]:
+            self._write_line(line)
+        self.line = [lines[-1]]
+
+    def _write_line(self, line):
+        self._write_content(line)
+        self.blank_lines += 1
+
+    def _write_content(self, content):
+        content = content.rstrip()
+        if content:
+            self.output.write("\n" * self.blank_lines + content)
+            self.blank_lines = 0
+
+    def close(self):
+        self._write_content("".join(self.line))
+        self.line = []
+        self.output.write("\n" if self.end_with_newline else "\n" * self.blank_lines)
+        self.blank_lines = 0
+
+
+class Converter(object):
+    """Converts between Python and JavaScript using a fixed set of routes, compiled once and reused for every
+       conversion the converter makes.
+
+       By default the built-in routes are used, passing in a Router (for instance one made with
+       handlers.routes.excluding(...)) uses it in their place everywhere within the converted code.
+    """
+    __slots__ = ('route_table', '_fingerprint')
+
+    def __init__(self, routes=None):
+        if routes is None or routes is handlers.routes:
+            self.route_table = handlers.route_table
+            self._fingerprint = None
+        else:
+            self.route_table = RouteTable(routes, replaces=handlers.routes)
+            self._fingerprint = (None, '')
+
+    @property
+    def fingerprint(self):
+        """Identifies the routes used within cache keys, empty for the built-in routes. It is worked out again
+           whenever a route has been added to any router, so output cached before then is never reused after"""
+        if self._fingerprint is None:
+            return ''
+
+        (changes, fingerprint) = self._fingerprint
+        if changes != Router.changes:
+            changes = Router.changes
+            fingerprint = "\n".join("{0}={1}.{2}".format(match_on, handler.__module__, handler.__name__)
+                                    for (match_on, handler) in itemsview(self.route_table.routes.routes))
+            self._fingerprint = (changes, fingerprint)
+        return fingerprint
+
+    def warm_up(self):
+        """Compiles the routes of every handler that can be reached up front, so the first conversions made are as
+           fast as the ones that follow"""
+        handlers_seen = set()
+        handlers_left = [Handler]
+        while handlers_left:
+            handler = handlers_left.pop()
+            if handler in handlers_seen or not issubclass(handler, Handler):
+                continue
+            handlers_seen.add(handler)
+            compiled = self.route_table[handler]
+            Matcher.compile(compiled.stop_on)
+            handlers_left.extend(valuesview(compiled.dispatch))
+
+    def ast(self, code, compact=False, parser=None):
+        """Takes the given Python or JavaScript code and returns back a rough Abstract Syntax Tree representation.
+           When compact is set the tree is returned as a view onto an array backed NodeTable, filled as the code is
+           parsed, using far less memory. A parser given is reset and reused, rather than setting up a new one"""
+        stats = Handler.stats
+        if stats is not None:
+            started = timer()
+        if parser is None:
+            parser = Parser(code)
+        else:
+            parser.reset(code)
+        table = None
+        if compact:
+            from .compact import NodeTable
+            table = NodeTable(parser)
+        tree = Handler(parser, routes=self.route_table, table=table)
+        if stats is not None:
+            stats.parsed(tree, timer() - started, self.route_table, table and table.counts())
+        if table is None:
+            return tree
+
+        parser.lexer = Lexer(code)  # the tokens found are only needed while parsing
+        return table.root
+
+    def javascript(self, code, cache=None):
+        """Takes the given Python or JavaScript code and returns back JavaScript code.
+           When a SegmentCache is given, the output for any top level segments already in it is reused"""
+        if cache is not None:
+            return self.cached(code, 'javascript', cache)
+        return render(self.ast(code), 'javascript')
+
+    def python(self, code, cache=None):
+        """Takes the given JavaScript or Python code and returns back Python code.
+           When a SegmentCache is given, the output for any top level segments already in it is reused"""
+        if cache is not None:
+            return self.cached(code, 'python', cache)
+        return render(self.ast(code), 'python')
+
+    def segment(self, text, language, cache, needs_output=True):
+        """Returns the (closed, output) entry for a single segment of code, converting it only if it isn't cached.
+           Segments that don't need rendering, as they leave something open, are stored without any output"""
+        key = cache.key(text, language, self.fingerprint)
+        entry = cache.get(key)
+        if entry is None or (needs_output and entry[1] is None):
+            tree = self.ast(text)
+            closed = is_closed(tree)
+            entry = (closed, render(tree, language) if closed or needs_output else None)
+            cache.set(key, entry)
+        return entry
+
+    def cached(self, code, language, cache):
+        """Converts code into the given language a top level segment at a time, reusing output found in cache"""
+        entries = {}
+
+        def closed(text):
+            entry = entries[text] = self.segment(text, language, cache, needs_output=False)
+            return entry[0]
+
+        output = []
+        for (start, end) in split(code, closed):
+            text = code[start:end]
+            entry = entries.get(text, None)
+            if entry is None or entry[1] is None:
+                entry = self.segment(text, language, cache)
+            output.append(entry[1])
+        return "".join(output)
+
+    def javascript_many(self, snippets, cache=None, size=1024):
+        """Takes an iterable of Python or JavaScript snippets, lazily yielding back JavaScript code for each in turn.
+           The last size distinct snippets are remembered, so repeated snippets are only converted once. When a
+           SegmentCache is given it is used instead, to share conversions between calls"""
+        return self.many(snippets, 'javascript', cache, size)
+
+    def python_many(self, snippets, cache=None, size=1024):
+        """Takes an iterable of JavaScript or Python snippets, lazily yielding back Python code for each in turn.
+           The last size distinct snippets are remembered, so repeated snippets are only converted once. When a
+           SegmentCache is given it is used instead, to share conversions between calls"""
+        return self.many(snippets, 'python', cache, size)
+
+    def many(self, snippets, language, cache=None, size=1024):
+        """Lazily yields each of the given snippets converted into language (see javascript_many and python_many).
+
+           Every snippet is rendered before the next is parsed, so a single parser, along with the token streams and
+           compiled matchers of its lexer, is reset and reused for all of them rather than set up again for each.
+        """
+        if cache is not None:
+            for snippet in snippets:
+                yield self.segment(snippet, language, cache)[1]
+            return
+
+        parser = Parser('')
+        converted = OrderedDict()
+        for snippet in snippets:
+            output = converted.pop(snippet, None)
+            if output is None:
+                output = render(self.ast(snippet, parser=parser), language)
+                if len(converted) >= size:
+                    converted.popitem(last=False)
+            converted[snippet] = output
+            yield output
+
+    def javascript_chunks(self, code):
+        """Takes the given Python or JavaScript code and yields back JavaScript code a piece at a time"""
+        return chunks(self.ast(code), 'javascript')
+
+    def python_chunks(self, code):
+        """Takes the given JavaScript or Python code and yields back Python code a piece at a time"""
+        return chunks(self.ast(code), 'python')
+
+    def both_chunks(self, code):
+        """Takes the given Python or JavaScript code, parsing it only once, and yields back (JavaScript, Python)
+           pairs of code a piece at a time"""
+        for child in self.ast(code).children:
+            javascript_code = render(child, 'javascript')
+            python_code = render(child, 'python')
+            yield (javascript_code, python_code)
+
+    def both(self, code):
+        """Takes the given Python or JavaScript code, parsing it only once, and returns back a
+           (JavaScript code, Python code) pair"""
+        javascript_code = []
+        python_code = []
+        for (javascript_chunk, python_chunk) in self.both_chunks(code):
+            javascript_code.append(javascript_chunk)
+            python_code.append(python_chunk)
+        return ("".join(javascript_code), "".join(python_code))
+
+    def javascript_stream(self, code, output, strip_whitespace=False):
+        """Takes the given Python or JavaScript code and writes JavaScript code to output as it is produced"""
+        stream(self.javascript_chunks(code), output, strip_whitespace)
+
+    def python_stream(self, code, output, strip_whitespace=False):
+        """Takes the given JavaScript or Python code and writes Python code to output as it is produced"""
+        stream(self.python_chunks(code), output, strip_whitespace)
+
+    def javascript_lines(self, lines):
+        """Takes Python or JavaScript code a line at a time from lines (for instance an open file), yielding back
+           JavaScript code a top level segment at a time as soon as the whole of each segment has been read"""
+        return self.lines(lines, 'javascript')
+
+    def python_lines(self, lines):
+        """Takes JavaScript or Python code a line at a time from lines (for instance an open file), yielding back
+           Python code a top level segment at a time as soon as the whole of each segment has been read"""
+        return self.lines(lines, 'python')
+
+    def lines(self, lines, language):
+        """Yields the given language's output for code read a line at a time, cutting the code read so far at the
+           last place a new segment begins whenever a line completes another possible segment.
+
+           Reading a line can only make, or settle, a place to cut within LOOKAHEAD characters of the code read before
+           it, so only the end of that code is searched again, along with the line. The lines themselves are kept
+           until they are needed as one piece of text, rather than copying everything read so far for every line.
+
+           When the code read so far can't be cut, as something is left open, it isn't tried again until there is
+           twice as much to parse, so a long construct holding many blank lines is only parsed a handful of times.
+        """
+        pending = []
+        (length, boundary, attempted, tail) = (0, 0, 0, "")
+        for line in lines:
+            pending.append(line)
+            window = tail + line
+            found = last_boundary(window)
+            if found is not None:
+                boundary = max(boundary, length - len(tail) + found)
+            length += len(line)
+            tail = window[-(LOOKAHEAD + 2):]
+            if not boundary or boundary < 2 * attempted:
+                continue
+
+            code = "".join(pending)
+            pending = [code]
+            text = code[:boundary]
+            tree = self.ast(text)
+            found = cuts(text, tree)
+            if is_closed(tree) and completes_decorators(text, found[-1][0] if found else 0, boundary):
+                found.append((boundary, len(tree.children)))
+            if not found:
+                attempted = boundary
+                continue
+
+            (offset, index) = found[-1]
+            yield "".join(chunks(tree, language, index))
+            code = code[offset:]
+            (pending, length, boundary, attempted, tail) = ([code], len(code), boundary - offset, 0,
+                                                            code[-(LOOKAHEAD + 2):])
+        yield "".join(chunks(self.ast("".join(pending)), language))
+
+    def both_stream(self, code, javascript_output, python_output, strip_whitespace=False):
+        """Takes the given Python or JavaScript code, parsing it only once, and writes JavaScript and Python code to
+           their respective outputs as it is produced"""
+        if strip_whitespace:
+            javascript_output = StrippedOutput(javascript_output)
+            python_output = StrippedOutput(python_output)
+        for (javascript_chunk, python_chunk) in self.both_chunks(code):
+            javascript_output.write(javascript_chunk)
+            python_output.write(python_chunk)
+        if strip_whitespace:
+            javascript_output.close()
+            python_output.close()
+
+
+def render(tree, language):
+    """Returns the given language's output for tree, timing how long it takes when statistics are enabled"""
+    if not isinstance(tree, Handler):
+        return getattr(tree, language)
+
+    stats = Handler.stats
+    if stats is None:
+        return tree.render_nested(language)
+
+    started = timer()
+    output = tree.render_nested(language)
+    stats.rendered(timer() - started)
+    return output
+
+
+def chunks(tree, language, count=None):
+    """Yields the given language's output for the tree produced by ast() one top level construct at a time, so the
+       complete output never needs to be held in memory, stopping after count constructs when given"""
+    for child in tree.children[:count]:
+        yield render(child, language)
+
+
+def stream(pieces, output, strip_whitespace=False):
+    """Writes pieces of code to the given file-like output as they are produced, optionally removing trailing
+       whitespace and ensuring the output ends in a single new line"""
+    if strip_whitespace:
+        output = StrippedOutput(output)
+    for piece in pieces:
+        output.write(piece)
+    if strip_whitespace:
+        output.close()
+
+
+converter = Converter()
+ast = converter.ast
+javascript = converter.javascript
+python = converter.python
+javascript_many = converter.javascript_many
+python_many = converter.python_many
+javascript_chunks = converter.javascript_chunks
+python_chunks = converter.python_chunks
+both_chunks = converter.both_chunks
+both = converter.both
+javascript_stream = converter.javascript_stream
+python_stream = converter.python_stream
+both_stream = converter.both_stream
+javascript_lines = converter.javascript_lines
+python_lines = converter.python_lines
@@ -22,6 +22,14 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+
 import jiphy
 
 
@@ -322,3 +330,638 @@ def test_for_loop_in_function_conversion():
                             '    for i in range(0, config.SIZE):\n'
                             '        grid.append(0)\n'
                             '    \n\n\n\n')
+
+
+def test_text_till():
+    """Test to ensure the parser finds the earliest match, preferring the first given string on ties"""
+    parser = jiphy.parser.Parser("x = def(a) if y")
+    assert parser.text_till(("if", "^def(", "(")) == ("x =", "^def(")
+    assert parser.index == 4
+    assert parser.text_till("if", keep_index=True) == ("def(a) ", "if")
+    assert parser.index == 4
+    assert parser.text_till("missing") == ("def(a) if y", "")
+    assert not parser.more
+
+
+def test_word_before():
+    """Test to ensure the parser finds the last word before a match without moving, however often it is asked"""
+    parser = jiphy.parser.Parser("@first\n@second \ndef function  (a)")
+    parser += 1
+    assert parser.word_before("(") == "function"
+    assert parser.index == 1
+    parser += 22
+    assert parser.word_before("(") == "ction"
+    parser += 6
+    assert parser.word_before("(") == ""
+
+
+def test_pass_through_spans():
+    """Test to ensure plain text is kept as offsets into the original code rather than copied out of it"""
+    code = "x = 10\n"
+    text = jiphy.to.ast(code).children[0]
+    assert text.source is code
+    assert (text.start, text.end) == (0, 6)
+    assert text.code == "x = 10"
+
+
+def test_lexer():
+    """Test to ensure the lexer produces a token stream per stop-set and reuses it instead of rescanning"""
+    lexer = jiphy.parser.Lexer("a(b)(c)")
+    stop_on = ("(", ")")
+    assert list(lexer.tokens(stop_on)) == [(0, 1, 2), (1, 3, 4), (0, 4, 5), (1, 6, 7)]
+    assert lexer.token(stop_on, 2) == (1, 3, 4)
+    assert lexer.token(stop_on, 7) == (-1, 7, 7)
+    assert len(lexer.streams[stop_on].starts) == 4
+
+
+def test_first_line_block_indentation():
+    """Test to ensure a block opened on the very first line is closed at that line's indentation"""
+    assert jiphy.to.javascript("  if x:\n"
+                               "    y()\n"
+                               "\n") == ("  if (x) {\n"
+                                         "    y();\n"
+                                         "  }\n")
+
+
+def test_line_index():
+    """Test to ensure the parser can look up lines, columns, and indentation without rescanning"""
+    parser = jiphy.parser.Parser("a\n  bc\n\tx\n")
+    assert list(parser.line_starts) == [0, 2, 7, 10]
+    assert list(parser.indents) == [0, 2, 1, 0]
+    assert parser.line_number(4) == 1
+    assert parser.column(4) == 2
+    assert parser.indentation(5) == "  "
+    assert parser.indentation(3) == " "
+    assert parser.indentation(8) == "\t"
+
+
+def test_next_and_prev_content():
+    """Test to ensure the closest non-whitespace content is found in either direction"""
+    parser = jiphy.parser.Parser("a  \n\t.b \n")
+    assert parser.next_content(1) == "."
+    assert parser.next_content(1, 2) == ".b"
+    assert parser.next_content(8) == ""
+    assert parser.next_content(20) == ""
+    assert parser.prev_content(4) == ""
+    assert parser.prev_content(6, 1) == "."
+    assert parser.prev_content(0) == ""
+
+
+def test_deeply_nested_parse():
+    """Test to ensure nesting deeper than Python's recursion limit can still be parsed"""
+    depth = sys.getrecursionlimit() * 2
+    node = jiphy.to.ast("(" * depth + ")" * depth)
+    levels = 0
+    while node.children:
+        node = node.children[0]
+        levels += 1
+    assert levels == depth
+    assert node.ended_on == ")"
+
+
+def test_render_cache():
+    """Test to ensure rendered output is reused within a render, but never kept from one render to the next"""
+    depth = 40
+    code = "".join("{0}if x{1}:\n".format("    " * level, level) for level in range(depth)) + "    " * depth + "y()\n"
+    tree = jiphy.to.ast(code + "\n" * (depth + 1))
+    renders = []
+    original = jiphy.handlers.Handler.render
+
+    def counted(handler, language, renderer):
+        def counting():
+            renders.append(handler)
+            return renderer()
+        return original(handler, language, counting)
+
+    jiphy.handlers.Handler.render = counted
+    try:
+        output = tree.javascript
+    finally:
+        jiphy.handlers.Handler.render = original
+    assert output.count("}") == depth
+    assert len(renders) == len(set(renders))  # each handler is rendered once however deeply the blocks nest
+    assert all(handler.rendered is None for handler in renders)
+
+    tree = jiphy.to.ast("x = 1\n")
+    assert tree.javascript == "x = 1;\n"
+    tree.children.append(jiphy.handlers.PassThrough('y = 2\n', tree))
+    assert tree.javascript == "x = 1;\ny = 2\n"
+
+    code = "class A(object):\n    def f(self):\n        pass   \n\n    \n\n"
+    tree = jiphy.to.ast(code)
+    output = tree.javascript
+    assert tree.javascript == output  # rendering leaves the tree as it was
+    assert tree.python == code
+
+
+def test_stream():
+    """Test to ensure conversions can be written to a file-like object as they are produced"""
+    code = "def f(a):\n    print(a)   \n\n\n"
+    output = StringIO()
+    jiphy.to.javascript_stream(code, output)
+    assert output.getvalue() == jiphy.to.javascript(code)
+    assert "".join(jiphy.to.python_chunks(code)) == jiphy.to.python(code)
+
+    output = StringIO()
+    jiphy.to.javascript_stream(code, output, strip_whitespace=True)
+    assert output.getvalue() == ("function f(a) {\n"
+                                 "    console.log(a);\n"
+                                 "}\n")
+
+
+def test_both():
+    """Test to ensure JavaScript and Python can both be produced from a single parse"""
+    code = ("import underscore as _\n"
+            "def my_function(test):\n"
+            "    some_other_function(test)\n"
+            "\n")
+    assert jiphy.to.both(code) == (jiphy.to.javascript(code), jiphy.to.python(code))
+
+
+def test_compact_ast():
+    """Test to ensure the compact node table exposes the same tree, and output, as the full handler tree"""
+    code = ("def my_function(test):\n"
+            "    some_other_function(test)\n"
+            "\n")
+    tree = jiphy.to.ast(code)
+    compact = jiphy.to.ast(code, compact=True)
+    assert repr(compact) == repr(tree)
+    assert compact.javascript == tree.javascript
+    assert compact.python == tree.python
+
+    block = compact.children[1]
+    assert block.handler is jiphy.handlers.PythonBlock
+    assert block.indent == ""
+    assert block.prev.handler is jiphy.handlers.Function
+    assert block.parent == compact
+    assert block[0].code == "    some_other_function"
+    assert block.index == 1 and block.next is None and block.prev.index == 0
+    assert compact.table.nbytes < len(compact.table) * 32
+
+    code = "".join("def function_{0}(test):\n    return test\n\n\n".format(number) for number in range(20))
+    tree = jiphy.to.ast(code)
+    compact = jiphy.to.ast(code, compact=True)
+    table = jiphy.compact.NodeTable(jiphy.parser.Parser(code))
+    root = jiphy.handlers.Handler(table.parser, routes=jiphy.to.converter.route_table, table=table)
+    assert not root.children and len(table) == len(compact.table)  # filled while parsing, no handler tree kept
+    assert [child.javascript for child in compact.children] == [child.javascript for child in tree.children]
+    assert compact.children[5].next == compact.children[6]
+
+
+def test_custom_routes():
+    """Test to ensure a converter can use its own set of routes without affecting the default conversion"""
+    from jiphy.cache import SegmentCache
+
+    code = ("print(x)\n"
+            "if x:\n"
+            "    print(y)\n"
+            "\n")
+    converter = jiphy.to.Converter(jiphy.handlers.routes.excluding('print', 'console.log'))
+    assert converter.javascript(code) == "print(x);\nif (x) {\n    print(y);\n}\n"
+    assert jiphy.to.javascript(code) == "console.log(x);\nif (x) {\n    console.log(y);\n}\n"
+
+    no_nested_parens = jiphy.handlers.IfStatement.accept_children
+    assert '(' not in no_nested_parens.match_on
+    assert no_nested_parens.get('print') is jiphy.handlers.PrintFunction
+    assert no_nested_parens.get('(') is None
+
+    custom = jiphy.router.Router()
+    converter = jiphy.to.Converter(custom)
+    cache = SegmentCache()
+    assert converter.javascript("print(x)\n") == "print(x)\n"
+    assert converter.javascript("print(x)\n", cache=cache) == "print(x)\n"
+    custom.add('print')(jiphy.handlers.PrintFunction)
+    assert converter.javascript("print(x)\n") == "console.log(x)\n"
+    assert converter.javascript("print(x)\n", cache=cache) == "console.log(x)\n"
+
+
+def test_lazy_import():
+    """Test to ensure importing jiphy alone leaves loading the converter until it is first used"""
+    if sys.version_info < (3, 7):
+        return
+
+    code = ("import sys, jiphy\n"
+            "assert 'jiphy.to' not in sys.modules\n"
+            "import jiphy.main\n"
+            "assert 'jiphy.to' not in sys.modules and 'jiphy.parallel' not in sys.modules\n"
+            "assert jiphy.to.javascript('print(x)\\n') == 'console.log(x);\\n'\n")
+    subprocess.check_call([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_server():
+    """Test to ensure the conversion server answers line delimited JSON requests"""
+    from jiphy.server import Server
+
+    requests = StringIO('{"id": 1, "method": "javascript", "code": "print(x)\\n"}\n'
+                        '\n'
+                        '{"id": 2, "method": "both", "code": "print(x)\\n"}\n'
+                        '{"id": 3, "method": "python", "code": "a\\n    console.log(y);\\nb\\n", "range": [4, 8]}\n'
+                        '{"id": 4, "method": "ruby"}\n'
+                        'not json\n')
+    responses = StringIO()
+    Server().serve(requests, responses)
+    responses = [json.loads(line) for line in responses.getvalue().splitlines()]
+    assert responses[0] == {'id': 1, 'javascript': 'console.log(x);\n'}
+    assert responses[1] == {'id': 2, 'javascript': 'console.log(x);\n', 'python': 'print(x)\n'}
+    assert responses[2] == {'id': 3, 'range': [2, 22], 'python': '    print(y)\n'}
+    assert responses[3]['id'] == 4 and 'error' in responses[3]
+    assert 'error' in responses[4] and len(responses) == 5
+
+
+def test_server_socket():
+    """Test to ensure the server answers clients connected to a Unix socket at once, replacing a stale socket and
+       removing its own when terminated"""
+    import signal
+    import socket
+    import time
+    from jiphy.server import remove_stale_socket
+
+    if not hasattr(socket, 'AF_UNIX'):
+        return
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'jiphy.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    code = "import sys\nfrom jiphy.server import Server\nServer().serve_socket(sys.argv[1])\n"
+    server = subprocess.Popen([sys.executable, '-c', code, path], cwd=os.path.dirname(os.path.abspath(__file__)))
+    clients = []
+    try:
+        for _ in range(2):
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            for _ in range(200):
+                try:
+                    client.connect(path)
+                    break
+                except socket.error:
+                    time.sleep(0.05)
+            clients.append(client)
+
+        for (request_id, client) in reversed(list(enumerate(clients))):
+            client.sendall('{{"id": {0}, "code": "print(x)\\n"}}\n'.format(request_id).encode('utf8'))
+            response = b''
+            while not response.endswith(b'\n'):
+                response += client.recv(4096)
+            assert json.loads(response.decode('utf8')) == {'id': request_id, 'javascript': 'console.log(x);\n'}
+
+        try:
+            remove_stale_socket(path)
+            assert False, "a socket still being served should never be removed"
+        except socket.error:
+            pass
+    finally:
+        for client in clients:
+            client.close()
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    assert not os.path.exists(path)
+    shutil.rmtree(directory)
+
+
+def test_session():
+    """Test to ensure a session re-converts only the segments an edit touches, reporting which output lines changed"""
+    from jiphy.session import Session
+
+    code = ("import underscore as _\n"
+            "\n"
+            "def first(test):\n"
+            "    print(test)\n"
+            "\n"
+            "\n"
+            "def second(test):\n"
+            "    print(test)\n"
+            "\n")
+    session = Session(code)
+    assert session.output == jiphy.to.javascript(code)
+    assert session.starts == [0, 24, 59]
+    assert Session("print(" * 5000).output == "console.log(" * 5000
+    untouched = session.trees[0]
+
+    edit = code.index("print", 70)
+    assert session.edit(edit, edit + len("print"), "other") == (7, 1, ["    other(test);\n"])
+    assert session.code == code[:edit] + "other" + code[edit + len("print"):]
+    assert session.output == jiphy.to.javascript(session.code)
+    assert session.trees[0] is untouched
+
+    session.edit(len(code) - 1, len(code), "")
+    assert session.output == jiphy.to.javascript(session.code)
+
+
+def test_split_after_something_left_open():
+    """Test to ensure code following something left open is only parsed a handful of times, however many places a new
+       segment could begin within it"""
+    from jiphy.session import Session
+
+    parsed = []
+
+    class CountingConverter(jiphy.to.Converter):
+        def ast(self, code, compact=False):
+            parsed.append(len(code))
+            return jiphy.to.Converter.ast(self, code, compact)
+
+    converter = CountingConverter()
+    code = "x = print(\n" + "def f(a):\n    return a\n\n\n" * 1000
+    assert jiphy.segments.split(code, lambda text: jiphy.segments.is_closed(converter.ast(text))) == [(0, len(code))]
+    assert sum(parsed) < 4 * len(code)
+
+    session = Session("x = 1\n\n" + code[len("x = print(\n"):], converter=converter)
+    del parsed[:]
+    session.edit(0, len("x = 1\n"), "x = print(\n")
+    assert session.output == jiphy.to.javascript(session.code)
+    assert sum(parsed) < 8 * len(session.code)
+
+
+def test_segment_cache():
+    """Test to ensure converting through a segment cache gives the same output while reusing cached segments"""
+    from jiphy.cache import SegmentCache
+
+    shared = ("import underscore as _\n"
+              "\n"
+              "def helper(test):\n"
+              "    print(test)\n"
+              "\n")
+    first = shared + "\ndef first():\n    return 1\n\n"
+    second = shared + "\ndef second():\n    return 2\n\n"
+
+    cache = SegmentCache()
+    assert jiphy.to.javascript(first, cache=cache) == jiphy.to.javascript(first)
+    hits = cache.hits
+    assert jiphy.to.javascript(second, cache=cache) == jiphy.to.javascript(second)
+    assert cache.hits > hits
+    assert jiphy.to.python(second, cache=cache) == jiphy.to.python(second)
+
+    cache = SegmentCache(size=2)
+    assert jiphy.to.javascript(first + second, cache=cache) == jiphy.to.javascript(first + second)
+    assert len(cache) == 2
+
+    directory = tempfile.mkdtemp()
+    try:
+        jiphy.to.javascript(first, cache=SegmentCache(directory=directory))
+        cache = SegmentCache(directory=directory)
+        assert jiphy.to.javascript(first, cache=cache) == jiphy.to.javascript(first)
+        assert cache.hits and not cache.misses
+
+        cache = SegmentCache(directory=directory, disk_size=4)
+        for index in range(6):
+            jiphy.to.javascript("x = {0}\n\ny = {0}\n\n".format(index), cache=cache)
+        assert sum(len(file_names) for (_, _, file_names) in os.walk(directory)) <= 5
+        assert cache.prune(keep=1) and sum(len(file_names) for (_, _, file_names) in os.walk(directory)) == 1
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_manifest():
+    """Test to ensure the manifest only reports files as unchanged while they, and their output, stay the same"""
+    from jiphy.manifest import Manifest
+
+    directory = tempfile.mkdtemp()
+    try:
+        file_name = os.path.join(directory, "code.py")
+        output_file_name = os.path.join(directory, "code.js")
+        for name in (file_name, output_file_name):
+            with open(name, 'w') as output:
+                output.write("print(x)\n")
+
+        manifest = Manifest(os.path.join(directory, "cache"), options=['js'])
+        assert not manifest.unchanged(file_name)
+        manifest.record(file_name, [output_file_name])
+        manifest.save()
+
+        manifest = Manifest(os.path.join(directory, "cache"), options=['js'])
+        assert manifest.unchanged(file_name)
+        assert not Manifest(os.path.join(directory, "cache"), options=['py']).unchanged(file_name)
+
+        os.utime(file_name, None)
+        assert manifest.unchanged(file_name)
+
+        with open(file_name, 'w') as output:
+            output.write("print(y)\n")
+        assert not manifest.unchanged(file_name)
+
+        manifest.record(file_name, [output_file_name])
+        os.remove(output_file_name)
+        assert not manifest.unchanged(file_name)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_convert_files_in_parallel():
+    """Test to ensure converting files in several processes gives the same results, in the same order, as one"""
+    from jiphy.main import convert_files
+
+    directory = tempfile.mkdtemp()
+    try:
+        file_names = []
+        for index, size in enumerate((1, 20, 5)):
+            file_names.append(os.path.join(directory, "code{0}.py".format(index)))
+            with open(file_names[-1], 'w') as output:
+                output.write("def function(test):\n    print(test)\n\n\n" * size)
+
+        arguments = {'out_lang': '', 'out_ext': None, 'out_dir': '', 'conform': False, 'diff': False}
+        serial = list(convert_files(file_names, arguments))
+        assert [output_file_names for (output_file_names, log) in serial] == [[file_name[:-2] + "js"]
+                                                                                for file_name in file_names]
+        outputs = [open(file_name[:-2] + "js").read() for file_name in file_names]
+        assert list(convert_files(file_names, arguments, jobs=2)) == serial
+        assert [open(file_name[:-2] + "js").read() for file_name in file_names] == outputs
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_failed_conversion_keeps_output():
+    """Test to ensure a conversion that fails part way through leaves the last output in place, not a partial file"""
+    from jiphy.main import convert_file
+
+    def failing_chunks(code):
+        yield "partial(\n"
+        raise KeyboardInterrupt()
+
+    directory = tempfile.mkdtemp()
+    javascript_chunks = jiphy.to.javascript_chunks
+    try:
+        file_name = os.path.join(directory, "code.py")
+        with open(file_name, 'w') as output:
+            output.write("print(x)\n")
+        arguments = {'out_lang': '', 'out_ext': None, 'out_dir': '', 'conform': False, 'diff': False}
+        convert_file(file_name, arguments)
+
+        jiphy.to.javascript_chunks = failing_chunks
+        try:
+            convert_file(file_name, arguments)
+        except KeyboardInterrupt:
+            pass
+        else:
+            assert False, "the conversion should have been interrupted"
+        assert sorted(os.listdir(directory)) == ["code.js", "code.py"]
+        assert open(os.path.join(directory, "code.js")).read() == "console.log(x);\n"
+    finally:
+        jiphy.to.javascript_chunks = javascript_chunks
+        shutil.rmtree(directory)
+
+
+def test_parallel_chunks():
+    """Test to ensure converting a single piece of code in parallel chunks gives exactly what converting it whole
+       does"""
+    code = ("class Test(object):\n\n    def method(self):\n        print(self)\n\n\n@decorator\ndef function(test):\n"
+            "    if test:\n        return True\n\n\nvar x = 1\n\nfunction other(y) {\n    return y;\n}\n\n") * 20
+    assert len(jiphy.parallel.chunks(code, 200)) > 10
+    assert jiphy.parallel.convert(code, 'javascript', jobs=2, chunk_size=200) == jiphy.to.javascript(code)
+    assert jiphy.parallel.convert(code, 'python', jobs=2, chunk_size=200) == jiphy.to.python(code)
+    assert jiphy.parallel.convert(code, 'both', jobs=3, chunk_size=150) == jiphy.to.both(code)
+
+
+def test_aio():
+    """Test to ensure code and files can be converted from within an asyncio event loop"""
+    if sys.version_info < (3, 6):
+        return
+
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    import jiphy.aio
+
+    loop = asyncio.new_event_loop()
+    directory = tempfile.mkdtemp()
+    try:
+        assert loop.run_until_complete(jiphy.aio.convert("print(x)\n")) == "console.log(x);\n"
+        assert loop.run_until_complete(jiphy.aio.convert("print(x)\n", 'both')) == ("console.log(x);\n",
+                                                                                    "print(x)\n")
+        try:
+            loop.run_until_complete(jiphy.aio.convert("x\n", 'ruby'))
+            assert False
+        except ValueError:
+            pass
+
+        paths = []
+        for index in range(5):
+            paths.append(os.path.join(directory, "code{0}.jiphy".format(index)))
+            with open(paths[-1], 'w') as output:
+                output.write("print({0})\n".format(index))
+
+        converted = jiphy.aio.convert_many(paths, executor=ThreadPoolExecutor(2), concurrency=2, write=True)
+        outputs = {}
+        while True:
+            try:
+                (path, output) = loop.run_until_complete(converted.__anext__())
+            except StopAsyncIteration:
+                break
+            outputs[path] = output
+        assert outputs == dict((path, "console.log({0});\n".format(index)) for (index, path) in enumerate(paths))
+        assert open(paths[3][:-5] + "js").read() == "console.log(3);\n"
+    finally:
+        loop.close()
+        shutil.rmtree(directory)
+
+
+def test_watch_files():
+    """Test to ensure watching files converts only those that are created or change"""
+    from jiphy.main import file_stats, watch_files
+
+    directory = tempfile.mkdtemp()
+    try:
+        file_names = [os.path.join(directory, "code{0}.jiphy".format(index)) for index in range(3)]
+        for file_name in file_names[:2]:
+            with open(file_name, 'w') as output:
+                output.write("print(x)\n")
+        arguments = {'out_lang': '', 'out_ext': None, 'out_dir': '', 'conform': False, 'diff': False,
+                     'recursive': True, 'in_ext': 'jiphy', 'jobs': 1}
+        watching = watch_files([directory], arguments, file_stats(file_names), interval=0.01, debounce=0.01)
+
+        with open(file_names[1], 'w') as output:
+            output.write("print(True)\n")
+        os.utime(file_names[1], (0, 0))
+        with open(file_names[2], 'w') as output:
+            output.write("print(None)\n")
+        changed = [next(watching), next(watching)]
+        assert [(file_name, output_file_names) for (file_name, output_file_names, log, seconds) in changed] == \
+               [(file_name, [file_name[:-5] + "js"]) for file_name in file_names[1:]]
+        assert open(file_names[1][:-5] + "js").read() == "console.log(true);\n"
+        assert not os.path.exists(file_names[0][:-5] + "js")
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_convert_lines():
+    """Test to ensure code read a line at a time is converted, and yielded, a segment at a time as soon as possible"""
+    code = ("@decorator\ndef function(test):\n    if test:\n        print(test)\n\n    return test\n\n\n"
+            "var x = None\n\nvar y = True\n")
+    read = []
+
+    def lines():
+        for line in code.splitlines(True):
+            read.append(line)
+            yield line
+
+    converted = jiphy.to.javascript_lines(lines())
+    assert next(converted) == jiphy.to.javascript(code)[:-len("var x = null;\n\nvar y = true;\n")]
+    assert "".join(read) == code[:-len("\nvar y = True\n")]
+    assert "".join(converted) == "var x = null;\n\nvar y = true;\n"
+    assert "".join(jiphy.to.python_lines(code.splitlines(True))) == jiphy.to.python(code)
+
+    code = "".join("x{0} = print(y{0})\n".format(number) for number in range(2000))  # never a place to cut
+    searched = []
+    last_boundary = jiphy.to.last_boundary
+    try:
+        jiphy.to.last_boundary = lambda text, start=0: searched.append(len(text) - start) or last_boundary(text, start)
+        assert "".join(jiphy.to.javascript_lines(code.splitlines(True))) == jiphy.to.javascript(code)
+    finally:
+        jiphy.to.last_boundary = last_boundary
+    assert sum(searched) < 2 * len(code)
+
+
+def test_convert_many():
+    """Test to ensure many snippets can be converted in one call, converting repeated snippets only once"""
+    import jiphy.cache
+
+    snippets = ["print(x)\n", "if a:\n    b()\n\n", "var y = None\n", "print(x)\n"]
+    converted = list(jiphy.to.javascript_many(snippets, size=3))
+    assert converted == [jiphy.to.javascript(snippet) for snippet in snippets]
+    assert converted[0] is converted[3]
+    assert list(jiphy.to.python_many(iter(snippets))) == [jiphy.to.python(snippet) for snippet in snippets]
+
+    distinct = ["def function(a):\n    return a + '(x)'\n\n\n", "x", "'''left open (", "(a", "print(y)\n", ""]
+    assert list(jiphy.to.javascript_many(distinct)) == [jiphy.to.javascript(snippet) for snippet in distinct]
+    parser = jiphy.parser.Parser(distinct[0])
+    jiphy.to.ast(distinct[0], parser=parser)
+    assert repr(jiphy.to.ast(distinct[3], parser=parser)) == repr(jiphy.to.ast(distinct[3]))
+
+    cache = jiphy.cache.SegmentCache()
+    assert list(jiphy.to.javascript_many(snippets, cache)) == converted
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_stats():
+    """Test to ensure statistics are collected on conversions only while enabled"""
+    jiphy.stats.disable()
+    stats = jiphy.stats.enable()
+    try:
+        assert jiphy.stats.enable() is stats
+        code = "def function(test):\n    if test:\n        print(test)\n\n    return test\n\n\n"
+        assert jiphy.to.javascript(code) == jiphy.to.converter.javascript(code)
+        summary = stats.summary()
+        assert (summary['conversions'], summary['characters']) == (2, 2 * len(code))
+        assert summary['handlers']['Function']['nodes'] == 2
+        assert summary['handlers']['IfStatement']['nodes'] == 2
+        assert sum(handler['scanned'] for handler in summary['handlers'].values()) > 0
+        assert summary['parse_seconds'] > 0 and summary['render_seconds'] > 0
+        assert "Function" in stats.table()
+        json.dumps(summary)
+    finally:
+        assert jiphy.stats.disable() is stats
+    assert jiphy.stats.collected() is None
+
+    jiphy.to.javascript(code)
+    assert stats.summary() == summary
+
+
+def test_pathological_input():
+    """Test to ensure hostile input is converted in a single pass, however it ends or however deeply it nests"""
+    assert jiphy.to.javascript("x = 1\nif (") == "x = 1;\nif ("
+    assert jiphy.to.javascript("print(" * 5000) == "console.log(" * 5000
+    assert jiphy.to.ast("print(" * 5000).depth == 5000 and jiphy.to.ast("print(x)\n").depth == 1
+    assert jiphy.to.python("console.log(" * 5000) == "print(" * 5000
+
+    decorated = "@first\n" * 1000 + "def function(a):\n    return a\n\n\n"
+    assert jiphy.to.javascript(decorated).startswith("function = first(function);\n" * 1000)